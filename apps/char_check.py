@@ -20,29 +20,35 @@ see if a character works for a particular version of mugen
 this high-tech, patented process uses advanced algorithms and
 proprietary data structures resulting in time and money saved.
 here's what it does:
-  make list of all characters
-  make match with first two characters in list
-  if crashes, change player #1 with kfm
-  if crashes, quarantine player #1
-  if doesn't crash, change player #2 with kfm
-  if crashes, discard player #2
-  if it doesn't crash, then those two players have a problem
-  repeat until no more characters
-
-requires character 'kfm', since it is known to work 100%.
+  make list of all characters not checked before
+  put them in batches, split between the two sides of a match, with
+  teams as big as the mugen executable allows (four a side in turns
+  for mugen 1.x, one a side for winmugen)
+  if a match doesn't crash, the whole batch is good (running past the
+  time limit isn't a crash)
+  if it crashes, split the batch in half and test the first half
+  if that half doesn't crash, the other half has the problem
+  repeat until each broken character is found alone
+  (see libmugen.triage)
+
+requires character 'kfm', since it is known to work 100%; it fights a
+character that is tested alone.
 also, runs multiple copies of winmugen at once.
 """
 import os
 import asyncio
-import multiprocessing
-from concurrent.futures import ThreadPoolExecutor
 from os.path import join
 
-from libmugen.character import load_character, move_character
-from libmugen.matchprocess import MatchProcess
-from libmugen.path import temp_dir_context
-from libmugen.stage import load_stage, move_stage
+from libmugen.character import load_character
+from libmugen.config import PersistentConfigCache
+from libmugen.stage import load_stage
 from libmugen.context import MugenRoot
+from libmugen.manifest import Manifest
+from libmugen.matchprocess import team_mode
+from libmugen.results import ResultsStore
+from libmugen.sandbox import MatchSandbox
+from libmugen.scheduler import MatchScheduler
+from libmugen.triage import CrashTriage
 
 # On Windows, the default event loop is SelectorEventLoop which does not
 # support subprocesses. ProactorEventLoop should be used instead.
@@ -50,32 +56,7 @@ if os.name == 'nt':
     loop_ = asyncio.ProactorEventLoop()
     asyncio.set_event_loop(loop_)
 
-max_parallel_matches = multiprocessing.cpu_count() // 2
-
-
-async def match_in_thread(match):
-    """ Run a match to verify game doesn't crash
-    :param match: TestMatch
-    :return: boolean
-    """
-    match.start_process()
-    match.wait_until_ready()  # blocking
-    await loop.run_in_executor(executor, match.run_subprocess)
-    if match.returncode == 0:
-        return match
-    return None
-
-
-def setup_environment(match, root):
-    """ Setup environment for a match
-
-    mugen needs:
-
-    :return:
-    """
-    move_stage(match.stage, root)
-    move_character(match.player1, root)
-    move_character(match.player2, root)
+executable = 'winmugen.exe'
 
 
 def generate_default_character(root):
@@ -89,12 +70,14 @@ def generate_default_stage(root):
     return load_stage(path)
 
 
-@asyncio.coroutine
-def clean_match(player1, player2, stage):
-    with temp_dir_context() as temp_dir:
-        match = MatchProcess(player1, player2, stage=stage)
-        setup_environment(match, temp_dir)
-        yield from match_in_thread(match)
+async def clean_match(context, player1, player2, stage, team1=(), team2=()):
+    """ Run a match in its own copy of the mugen folder
+    """
+    with MatchSandbox(context.root) as sandbox:
+        match = await sandbox.prepare(context, player1, player2, stage, team1=team1, team2=team2,
+                                      executable=executable, team_mode=team_mode(executable)[1])
+        await match.run()
+        return match
 
 
 def load_characters_lazy(root, player1=None, player2=None, stage=None):
@@ -113,30 +96,20 @@ def load_characters_lazy(root, player1=None, player2=None, stage=None):
             'stage': stage if stage else generate_default_stage(root)}
 
 
-async def start_match(root, char):
-    kwargs = load_characters_lazy(root, player1=char)
-    match = MatchProcess(**kwargs)
-    await match_in_thread(match)
+async def start_match(context, char):
+    kwargs = load_characters_lazy(context.root, player1=char)
+    del kwargs['root']
+    return await clean_match(context, **kwargs)
 
 
-async def load_context(root, context_cache="context.cache"):
-    """ Load MugenRoot context, using cache if available.
+async def load_context(root, manifest='manifest.json', results=None):
+    """ Load MugenRoot context, only scanning files changed since last time.
 
+    :param results: libmugen.results.ResultsStore to record checks in, if any
     :rtype: MugenRoot
     """
-    import pickle
-
-    try:
-        with open(context_cache, "rb") as fp:
-            context = pickle.load(fp)
-
-    except FileNotFoundError:
-        context = MugenRoot(root)
-        await context.scan_root()
-
-        with open(context_cache, "wb") as fp:
-            pickle.dump(context, fp)
-
+    context = MugenRoot(root, PersistentConfigCache(root), Manifest(manifest), results)
+    await context.scan_root()
     return context
 
 
@@ -146,13 +119,52 @@ async def test_characters():
     :return:
     """
     root = join('z:\\', 'Dropbox', 'mugen', 'testing-build')
-    context = await load_context(root)
-
-    sem = asyncio.Semaphore(max_parallel_matches)
-    for char in context.characters:
-        await sem.acquire()
-        task = asyncio.ensure_future(start_match(root, char))
-        task.add_done_callback(lambda x: sem.release())
+    with ResultsStore('results.sqlite', join(root, executable)) as results:
+        context = await load_context(root, results=results)
+        characters = context.characters
+
+        default_character = generate_default_character(root)
+        default_stage = generate_default_stage(root)
+
+        def character_keys():
+            # hashing stats every file of every character, so it is done
+            # once, away from the event loop
+            keys = dict()
+            for character in characters:
+                entry = context.manifest.get(character.path)
+                keys[character.path] = results.key(character.path, entry.assets if entry else ())
+            return keys
+
+        loop = asyncio.get_event_loop()
+        keys = await loop.run_in_executor(None, character_keys)
+
+        def key(character):
+            # unchanged characters are not tested again with the same build
+            return keys[character.path]
+
+        async with MatchScheduler() as scheduler:
+            async def test(group):
+                # the group is split between the two sides; one character
+                # alone fights kfm.  errors starting the match are raised,
+                # not taken as a verdict on the characters
+                if len(group) == 1:
+                    side1, side2 = group, [default_character]
+                else:
+                    half = (len(group) + 1) // 2
+                    side1, side2 = group[:half], group[half:]
+                match = await scheduler.submit(clean_match, context, side1[0], side2[0],
+                                               default_stage, side1[1:], side2[1:])
+                results.record_match(match, map(key, group))
+                return not match.crashed
+
+            # a batch fills both sides of a match
+            batch_size = team_mode(executable)[0] * 2
+            triage = CrashTriage(test, batch_size, results.compatibility, key)
+            good, broken = await triage.run(characters)
+
+    print('{} good, {} broken, {} matches'.format(len(good), len(broken), triage.launches))
+    for character in broken:
+        print('broken:', character.path)
 
 
 async def test_stages():
@@ -166,7 +178,5 @@ if __name__ == '__main__':
 
     loop = asyncio.get_event_loop()
     loop.set_debug(True)
-    executor = ThreadPoolExecutor(max_parallel_matches)
-    loop.set_default_executor(executor)
     loop.run_until_complete(test_characters())
     # loop.run_until_complete(test_stages())
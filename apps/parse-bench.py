@@ -0,0 +1,190 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Config parser benchmark
+
+Parses every .def, .cns, .st and .cmd file found in the folders given on the
+command line with the current MugenParser, and with the line by line parser
+it replaced.  Reports the time taken by each, and any file where the results
+are not the same.
+
+    python parse-bench.py z:\\mugen\\chars
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import sys
+import time
+from configparser import SectionProxy
+
+from libmugen.parse import MugenParser
+from libmugen.path import scantree
+
+extensions = ('.def', '.cns', '.st', '.cmd')
+repeat = 3
+
+
+class LegacyMugenParser(MugenParser):
+    """ MugenParser as it was, scanning each line for comments separately
+    """
+
+    def _read(self, fp, fpname):
+        elements_added = set()
+        cursect = None
+        sectname = None
+        optname = None
+        indent_level = 0
+        skip_header = True
+
+        e = None
+        for lineno, line in enumerate(fp, start=1):
+            comment_start = sys.maxsize
+
+            # strip inline comments
+            inline_prefixes = {p: -1 for p in self._inline_comment_prefixes}
+            while comment_start == sys.maxsize and inline_prefixes:
+                next_prefixes = {}
+                for prefix, index in inline_prefixes.items():
+                    index = line.find(prefix, index + 1)
+                    if index == -1:
+                        continue
+                    next_prefixes[prefix] = index
+                    if index == 0 or (index > 0 and line[index - 1].isspace()):
+                        comment_start = min(comment_start, index)
+                inline_prefixes = next_prefixes
+
+            # strip full line comments
+            for prefix in self._comment_prefixes:
+                if line.strip().startswith(prefix):
+                    comment_start = 0
+                    break
+
+            if comment_start == sys.maxsize:
+                comment_start = None
+
+            value = line[:comment_start].strip()
+
+            if not value:
+                if self._empty_lines_in_values:
+                    if (comment_start is None and
+                            cursect is not None and
+                            optname and
+                            cursect[optname] is not None):
+                        cursect[optname].append('')
+                else:
+                    indent_level = sys.maxsize
+                continue
+
+            first_nonspace = self.NONSPACECRE.search(line)
+            cur_indent_level = first_nonspace.start() if first_nonspace else 0
+            if cursect is not None and optname and cur_indent_level > indent_level:
+                cursect[optname].append(value)
+            else:
+                indent_level = cur_indent_level
+                mo = self.SECTCRE.match(value)
+                if mo:
+                    skip_header = False
+                    sectname = mo.group('header').lower()
+                    if sectname in self._sections:
+                        cursect = self._sections[sectname]
+                        elements_added.add(sectname)
+                    elif sectname == self.default_section:
+                        cursect = self._defaults
+                    else:
+                        cursect = self._dict()
+                        self._sections[sectname] = cursect
+                        self._proxies[sectname] = SectionProxy(self, sectname)
+                        elements_added.add(sectname)
+                    optname = None
+                elif cursect is None:
+                    indent_level = sys.maxsize
+                    if not skip_header:
+                        sectname = None
+                        optname = None
+                        cursect = None
+                else:
+                    mo = self._optcre.match(value)
+                    if mo:
+                        optname, vi, optval = mo.group('option', 'vi', 'value')
+                        if not optname:
+                            e = self._handle_error(e, fpname, lineno, line)
+                        optname = self.optionxform(optname.rstrip())
+                        elements_added.add((sectname, optname))
+                        if optval is not None:
+                            optval = optval.strip()
+                            cursect[optname] = [optval]
+                        else:
+                            cursect[optname] = None
+
+        if e:
+            raise e
+        self._join_multiline_values()
+
+
+def load_corpus(paths):
+    """ Return (path, text) for every config file in the folders given
+    """
+    corpus = list()
+    for path in paths:
+        for entry in scantree(path):
+            if entry.name.lower().endswith(extensions) and entry.is_file():
+                with open(entry.path, encoding='ascii', errors='surrogateescape') as fp:
+                    corpus.append((entry.path, fp.read()))
+    return corpus
+
+
+def parse(parser_class, text):
+    config = parser_class()
+    try:
+        config.read_string(text)
+    except Exception as e:
+        return type(e)
+    return {name: dict(config[name]) for name in config.sections()}
+
+
+def bench(parser_class, corpus):
+    """ Return the best time to parse the whole corpus
+    """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        for path, text in corpus:
+            try:
+                parser_class().read_string(text)
+            except Exception:
+                pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    corpus = load_corpus(sys.argv[1:])
+    lines = sum(text.count('\n') for path, text in corpus)
+    print('{} files, {} lines'.format(len(corpus), lines))
+
+    mismatched = [path for path, text in corpus
+                  if parse(MugenParser, text) != parse(LegacyMugenParser, text)]
+    for path in mismatched:
+        print('results differ:', path)
+
+    old = bench(LegacyMugenParser, corpus)
+    new = bench(MugenParser, corpus)
+    print('legacy  {:8.3f} s  {:10.0f} lines/s'.format(old, lines / old))
+    print('current {:8.3f} s  {:10.0f} lines/s'.format(new, lines / new))
+    print('speedup {:8.2f}x'.format(old / new))
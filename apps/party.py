@@ -93,11 +93,10 @@ import re
 import shutil
 import subprocess
 import time
-from io import StringIO
 
 import pyglet
 
-from libmugen import sff
+from libmugen.cache import SpriteCache
 from libmugen.character import Character
 
 base_dir = 'Z:\\Leif\\games\\mugen\\dist\\mugen-1\\'
@@ -106,8 +105,10 @@ launch_cmd = "mugen.exe -p1 {p1} -p2 {p2} -s {stage}"
 char_dir = 'chars'
 temp_char_dir = "temp_chars"
 grace_time = 5
+sprite_cache_dir = os.path.join(base_dir, 'cache', 'sprites')
 
 image_db = {}
+sprite_cache = None
 
 
 class MUGENGroup(pygame.sprite.Group):
@@ -143,64 +144,35 @@ class VersusScreen(object):
     pass
 
 
-# older SFF v1.01
-def grab_image(filename, groupno, imageno):
-    fh = open(filename, 'rb')
+def make_surface(sprite):
+    size = (sprite.width, sprite.height)
+    surface = pygame.image.fromstring(bytes(sprite.pixels), size, "P")
+    surface.set_palette(sprite.palette)
+    return surface
 
-    header = sff.sff_header1.parse(fh.read(512))
-    fh.seek(header.next_subfile)
-    subfile = sff.sff_subfile_header.parse(fh.read(32))
 
-    while subfile:
-        try:
-            fh.seek(subfile.next_subfile)
-            subfile = sff.sff_subfile_header.parse(fh.read(32))
-        except:
-            break
+def get_sprite_cache():
+    """ Return the sprite cache, making its folder on first use
+    """
+    global sprite_cache
+    if sprite_cache is None:
+        sprite_cache = SpriteCache(sprite_cache_dir)
+    return sprite_cache
 
-        if subfile.groupno == groupno and subfile.imageno == imageno:
-            return pygame.image.load((StringIO(fh.read(subfile.length))))
 
-    return None
-
-
-# decode rle8 data
-def decode(data):
-    def _bin(x, width):
-        return ''.join(str((x >> i) & 1) for i in range(width - 1, -1, -1))
-
-    image = ""
-    data.reverse()
-    while data:
-        byte = data.pop()
-        if (byte & 0xC0) == 0x40:
-            color = chr(data.pop())
-            image += (color * (byte & 0x3F))
-        else:
-            image += chr(byte)
-
-    return image
-
-
-palettes = {}
-
-
-def load_palette(data, palette_index):
-    palette = data.palettes.read()[palette_index]
-    return palette.palette_data.read()
+# older SFF v1.01
+def grab_image(filename, groupno, imageno):
+    try:
+        sprite = get_sprite_cache().load(filename, groupno, imageno)
+    except KeyError:
+        return None
+    return make_surface(sprite)
 
 
 # new SFF v2.00
-def load_image(data, groupno, itemno):
-    for sprite in data.sprites.read():
-        if sprite.groupno == groupno and sprite.itemno == itemno:
-            pixels = decode(sprite.compressed_image.value.pixels)
-            size = (sprite.width, sprite.height)
-            palette = load_palette(data, sprite.palette_index)
-            surface = pygame.image.fromstring(pixels, size, "P")
-            surface.set_palette(palette)
-            image_db[(groupno, itemno)] = surface
-            return
+def load_image(filename, groupno, itemno):
+    sprite = get_sprite_cache().load(filename, groupno, itemno)
+    image_db[(groupno, itemno)] = make_surface(sprite)
 
 
 air_regex = re.compile("(),(),(),(),()[HV],[AS]", re.I)
@@ -231,8 +203,6 @@ def drawVS(surface):
     spr_filename = motif_cfg.get('Files', 'spr')
     filename = os.path.join(os.path.dirname(motif_path), spr_filename)
 
-    spr_data = sff.sff2_file.parse_stream(open(filename, 'rb'))
-
     sections = []
     for s in motif_cfg.sections:
         try:
@@ -251,7 +221,7 @@ def drawVS(surface):
             start = section.start.split(',')
             start = [int(i) for i in start]
             g, i = [int(i) for i in section.spriteno.split(',')]
-            load_image(spr_data, g, i)
+            load_image(filename, g, i)
             surface.blit(image_db[(g, i)], start)
 
         elif s_type == 'anim':
@@ -337,6 +307,8 @@ if __name__ == "__main__":
              'stage': stage}
 
     show_versus(5)
+    if sprite_cache is not None:
+        sprite_cache.save()
 
     # start_time = time.time()
     # if start_time + grace_time > time.time():
@@ -0,0 +1,87 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+SFF v2 decoder benchmark
+
+Decodes every compressed sprite found in the SFF v2 files given on the
+command line, and reports the throughput of each decoder.
+
+    python sff-bench.py chars/kfm/kfm.sff data/system.sff
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import sys
+import time
+from collections import defaultdict
+
+from libmugen import sff
+
+repeat = 5
+
+
+def collect_samples(filename):
+    """ Return (format, data, size) for each compressed sprite in a file
+    """
+    samples = list()
+    with sff.SFFFile(filename) as sff_file:
+        for sprite in sff_file.sprite_list:
+            if sprite.format >= len(sff.sff2_formats):
+                continue
+            format = sff.sff2_formats[sprite.format]
+            if format in sff.decoders and sprite.data_length:
+                key = sprite.groupno, sprite.itemno
+                data = sff_file.sprite_data(*key)
+                samples.append((format, bytes(data), sprite.width * sprite.height))
+                data.release()
+    return samples
+
+
+def bench(samples):
+    """ Time each decoder over its samples; best of `repeat` runs
+    """
+    by_format = defaultdict(list)
+    for format, data, size in samples:
+        by_format[format].append((data, size))
+
+    print("{:<6} {:>8} {:>12} {:>12} {:>10} {:>10}".format(
+        'format', 'sprites', 'in (bytes)', 'out (bytes)', 'best (s)', 'MB/s out'))
+
+    for format, items in sorted(by_format.items()):
+        decode = sff.decoders[format]
+        best = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            for data, size in items:
+                decode(data, size)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        size_in = sum(len(data) for data, size in items)
+        size_out = sum(size for data, size in items)
+        rate = size_out / best / 1e6 if best else 0
+        print("{:<6} {:>8} {:>12} {:>12} {:>10.4f} {:>10.2f}".format(
+            format, len(items), size_in, size_out, best, rate))
+
+
+if __name__ == "__main__":
+    samples = list()
+    for filename in sys.argv[1:]:
+        samples.extend(collect_samples(filename))
+
+    bench(samples)
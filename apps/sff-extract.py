@@ -0,0 +1,237 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Bulk SFF sprite extraction
+
+Extract sprites from every SFF file in a MUGEN folder, or from a list of
+SFF files, and save them as PNG images.  Decoding is done in a pool of
+processes, each file by one process so it is only read and indexed once,
+and the images are written by a single thread.
+
+
+Usage
+-----
+
+Extract every portrait in a MUGEN folder:
+
+    python sff-extract.py -o thumbnails --group 9000 z:\\mugen
+
+Extract all sprites of a few files, using 4 processes:
+
+    python sff-extract.py -o sprites -j 4 kfm.sff system.sff
+
+Images are saved as <output>/<sff path>/g<group>-i<item>.png, where the
+sff path is relative to the folder given, or is the file name.
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO
+from os.path import basename, dirname, isdir, join, relpath, splitext
+
+from PIL import Image
+
+from libmugen.path import scantree
+from libmugen.sff import SFFFile
+
+def extract_sprite(sff_file, groupno, itemno):
+    """ Decode a sprite and encode it as PNG
+
+    :return: (group, item, png data or None, bytes read, error or None)
+    """
+    try:
+        sprite = sff_file.sprite(groupno, itemno)
+        if not sprite.width or not sprite.height:
+            return groupno, itemno, None, 0, 'empty sprite'
+
+        image = Image.frombytes('P', (sprite.width, sprite.height), bytes(sprite.pixels))
+        image.putpalette([value for color in sprite.palette for value in color[:3]])
+        fp = BytesIO()
+        image.save(fp, 'PNG')
+        return groupno, itemno, fp.getvalue(), len(sprite.pixels), None
+    except Exception as e:
+        # the exception may not be picklable, so only its text is sent back
+        return groupno, itemno, None, 0, '{}: {}'.format(type(e).__name__, e)
+
+
+def extract_file(path, group=None):
+    """ Extract the sprites of one sff file; runs in a worker process
+
+    The worker owns the whole file, so it is opened and indexed only once.
+
+    :param path: path to the sff file
+    :param group: only extract this sprite group, if set
+    :raises OSError, ValueError: the file can't be read
+    :return: list of results of extract_sprite
+    """
+    with SFFFile(path) as sff_file:
+        return [extract_sprite(sff_file, groupno, itemno) for groupno, itemno in sff_file
+                if group is None or groupno == group]
+
+
+def find_sff_files(paths):
+    """ Yield (sff path, output folder name) for every file or folder given
+    """
+    for path in paths:
+        if isdir(path):
+            for entry in scantree(path):
+                if entry.name.lower().endswith('.sff') and entry.is_file():
+                    yield entry.path, splitext(relpath(entry.path, path))[0]
+        else:
+            yield path, splitext(basename(path))[0]
+
+
+def writer(write_queue, errors):
+    """ Write images from the queue until None is received
+
+    The first error writing a file is added to errors, and the rest of the
+    queue is thrown away, so nothing waiting to put an image is blocked.
+    """
+    while True:
+        item = write_queue.get()
+        if item is None:
+            break
+        if errors:
+            continue
+        filename, data = item
+        try:
+            os.makedirs(dirname(filename), exist_ok=True)
+            with open(filename, 'wb') as fp:
+                fp.write(data)
+        except OSError as e:
+            errors.append(e)
+
+
+class Progress:
+    """ Count sprites and bytes, and print the throughput now and then
+    """
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.sprites = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def update(self, sprites, failed, bytes_in, bytes_out):
+        self.sprites += sprites
+        self.failed += failed
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+        now = time.perf_counter()
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report()
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print('{} sprites, {} failed, {:.0f} sprites/sec, {:.2f} MB/sec decoded, {:.2f} MB/sec written'.format(
+            self.sprites, self.failed, self.sprites / elapsed,
+            self.bytes_in / elapsed / 1e6, self.bytes_out / elapsed / 1e6))
+
+
+def extract(paths, output, group=None, workers=None, queue_size=256):
+    """ Extract sprites from sff files in parallel
+
+    :param paths: list of sff files or folders to search for them
+    :param output: folder to write images to
+    :param group: only extract this sprite group, if set
+    :param workers: number of processes; default is the cpu count
+    :param queue_size: maximum number of images waiting to be written
+    """
+    workers = workers or os.cpu_count() or 1
+    write_queue = queue.Queue(queue_size)
+    write_errors = list()
+    writer_thread = threading.Thread(target=writer, args=(write_queue, write_errors))
+    writer_thread.start()
+    progress = Progress()
+
+    def collect(future):
+        path, folder = pending.pop(future)
+        try:
+            results = future.result()
+        except (OSError, ValueError) as e:
+            print('skipping {}: {}'.format(path, e), file=sys.stderr)
+            return
+
+        failed = 0
+        bytes_in = bytes_out = 0
+        for groupno, itemno, data, size, error in results:
+            if data is None:
+                print('{} g{}-i{}: {}'.format(folder, groupno, itemno, error), file=sys.stderr)
+                failed += 1
+                continue
+            filename = join(output, folder, 'g{0}-i{1}.png'.format(groupno, itemno))
+            write_queue.put((filename, data))
+            bytes_in += size
+            bytes_out += len(data)
+        progress.update(len(results) - failed, failed, bytes_in, bytes_out)
+
+    pending = dict()
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            max_pending = workers * 4
+            for path, folder in find_sff_files(paths):
+                if write_errors:
+                    # stop decoding, since nothing more can be written
+                    for future in pending:
+                        future.cancel()
+                    break
+                future = executor.submit(extract_file, path, group)
+                pending[future] = path, folder
+                if len(pending) >= max_pending:
+                    done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+
+            while pending and not write_errors:
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+    finally:
+        write_queue.put(None)
+        writer_thread.join()
+
+    progress.report()
+    if write_errors:
+        raise write_errors[0]
+    return progress
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Extract SFF sprites as PNG images.')
+    parser.add_argument('paths', nargs='+', help='MUGEN folders or SFF files')
+    parser.add_argument('-o', '--output', default='sprites', help='folder to save images in')
+    parser.add_argument('-g', '--group', type=int, help='only extract this sprite group')
+    parser.add_argument('-j', '--jobs', type=int, help='number of worker processes')
+    parser.add_argument('-q', '--queue', type=int, default=256, help='images waiting to be written')
+    args = parser.parse_args()
+
+    try:
+        extract(args.paths, args.output, args.group, args.jobs, args.queue)
+    except OSError as e:
+        sys.exit('could not write images: {}'.format(e))
@@ -25,7 +25,7 @@ leif theden, 2012 - 2015
 public domain
 """
 
-from io import StringIO
+from io import BytesIO
 
 from PIL import Image
 
@@ -33,20 +33,17 @@ from libmugen import sff
 
 filename = 'sprite.sff'
 
-fh = open(filename, 'rb')
-
-header = sff.sff1_file.parse(fh.read(512))
-print(header)
-
-next_subfile = header.next_subfile
-while next_subfile:
-    fh.seek(next_subfile)
-    subfile = sff.sff1_subfile_header.parse(fh.read(32))
-    next_subfile = subfile.next_subfile
-    try:
-        image = Image.open(StringIO(fh.read(subfile.length)))
-    except IOError:
-        print("ioerror", subfile.groupno, subfile.imageno)
-        pass
-    else:
-        image.save("g{0}-i{1}.png".format(subfile.groupno, subfile.imageno))
+with sff.SFFFile(filename) as sff_file:
+    print(filename, 'version', sff_file.version, 'sprites', len(sff_file))
+
+    for subfile in sff_file.sprite_list:
+        key = subfile.groupno, subfile.imageno
+        data = sff_file.sprite_data(*key)
+        try:
+            image = Image.open(BytesIO(data))
+        except IOError:
+            print("ioerror", subfile.groupno, subfile.imageno)
+        else:
+            image.save("g{0}-i{1}.png".format(subfile.groupno, subfile.imageno))
+        finally:
+            data.release()
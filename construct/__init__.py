@@ -27,12 +27,13 @@ from construct.adapters import (BitIntegerAdapter, BitIntegerError, CStringAdapt
 from construct.core import (AdaptationError, Adapter, Anchor, ArrayError, Buffered, Construct, ConstructError,
                             Container, FieldError, FormatField, LazyBound, LazyContainer, ListContainer, MetaArray,
                             MetaField, OnDemand,
-                            OverwriteError, Packer, Pass, Peek, Pointer, Range, RangeError, Reconfig, RepeatUntil,
+                            OverwriteError, Packer, Pass, Peek, Pointer, Range, RangeError, Reconfig, Record,
+                            RecordArray, RepeatUntil,
                             Restream, Select,
                             SelectError, Sequence, SizeofError, StaticField, Struct, Subconstruct, Switch, SwitchError,
                             Terminator,
                             TerminatorError, ULInt24, Union, Value)
-from construct.debug import Debugger, Probe
+from construct.debug import Debugger, Probe, Profiler
 from construct.lib.expr import this
 from construct.macros import Alias, Aligned, AlignedStruct, Array, BFloat32, BFloat64, Bit, BitField, BitStreamReader, \
     BitStreamWriter, BitStruct, Bitwise, CString, Embedded, EmbeddedBitStruct, Enum, Field, Flag, FlagsEnum, \
@@ -72,8 +73,8 @@ __all__ = [
     'MappingAdapter', 'MappingError', 'MetaArray', 'MetaField', 'NFloat32', 'NFloat64', 'Nibble', 'NoneOf',
     'Octet', 'OnDemand', 'OnDemandPointer', 'OneOf', 'OpenRange', 'Optional', 'OptionalGreedyRange',
     'OverwriteError', 'Packer', 'PaddedStringAdapter', 'Padding', 'PaddingAdapter', 'PaddingError',
-    'PascalString', 'Pass', 'Peek', 'Pointer', 'PrefixedArray', 'Probe', 'Range', 'RangeError', 'Reconfig',
-    'Rename', 'RepeatUntil', 'Restream', 'SBInt16', 'SBInt32', 'SBInt64', 'SBInt8', 'SLInt16', 'SLInt32',
+    'PascalString', 'Pass', 'Peek', 'Pointer', 'PrefixedArray', 'Probe', 'Profiler', 'Range', 'RangeError', 'Reconfig',
+    'Record', 'RecordArray', 'Rename', 'RepeatUntil', 'Restream', 'SBInt16', 'SBInt32', 'SBInt64', 'SBInt8', 'SLInt16', 'SLInt32',
     'SLInt64', 'SLInt8', 'SNInt16', 'SNInt32', 'SNInt64', 'SNInt8', 'Select', 'SelectError', 'SeqOfOne',
     'Sequence', 'SizeofError', 'SlicingAdapter', 'StaticField', 'String', 'StringAdapter', 'Struct',
     'Subconstruct', 'Switch', 'SwitchError', 'SymmetricMapping', 'Terminator', 'TerminatorError',
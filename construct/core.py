@@ -1,4 +1,5 @@
 import sys
+from array import array as _array
 from struct import Struct as Packer
 
 from construct.lib import Container, LazyContainer, ListContainer
@@ -447,6 +448,160 @@ class MetaField(Construct):
 #===============================================================================
 # arrays and repeaters
 #===============================================================================
+class RecordArray(object):
+    """
+    Columnar result of a batch parsed array of structs.
+
+    Each named field is stored as one column, an ``array.array`` where the
+    field is a number, or a list. Indexing and iterating produce Containers,
+    so a RecordArray can be used in place of a list of parsed structs.
+
+    :param names: the field names
+    :param columns: a sequence for each name, all the same length
+    """
+    __slots__ = ["names", "columns"]
+
+    def __init__(self, names, columns):
+        self.names = names
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RecordArray(self.names, [column[index] for column in self.columns])
+        obj = Container()
+        for name, column in zip(self.names, self.columns):
+            obj[name] = column[index]
+        return obj
+
+    def __iter__(self):
+        for row in zip(*self.columns):
+            obj = Container()
+            for name, value in zip(self.names, row):
+                obj[name] = value
+            yield obj
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "%s(%r, %d records)" % (self.__class__.__name__, self.names, len(self))
+
+    def column(self, name):
+        """
+        Return all values of a field.
+
+        :param name: the field name
+        """
+        return self.columns[self.names.index(name)]
+
+
+# array typecodes for struct format characters, where the size matches
+_array_codes = {}
+for _format, _candidates in zip("bBhHiIlLqQfd", ("b", "B", "hil", "HIL", "hil", "HIL",
+                                                 "ilq", "ILQ", "ilq", "ILQ", "f", "d")):
+    for _code in _candidates:
+        if _array(_code).itemsize == Packer("<" + _format).size:
+            _array_codes[_format] = _code
+            break
+del _format, _candidates, _code
+
+
+class _BatchPlan(object):
+    """
+    How to unpack many fixed-size elements of a MetaArray at once.
+
+    :param order: struct byte order
+    :param codes: struct format codes of the element, one per value
+    :param names: field names for struct elements, or None for one value
+    """
+    __slots__ = ["order", "codes", "names", "packer"]
+
+    def __init__(self, order, codes, names):
+        self.order = order or "="
+        self.codes = codes
+        self.names = names
+        self.packer = Packer(self.order + "".join(codes))
+
+    def _column(self, code, values):
+        typecode = _array_codes.get(code)
+        if typecode is None:
+            return list(values)
+        return _array(typecode, values)
+
+    def unpack(self, data, count):
+        if self.names is None:
+            code = self.codes[0]
+            if code == "B":
+                return bytes(data)
+            typecode = _array_codes.get(code)
+            if typecode is None:
+                return [value for value, in self.packer.iter_unpack(data)]
+            values = _array(typecode, data)
+            if self.order != "=" and (self.order == "<") != (sys.byteorder == "little"):
+                values.byteswap()
+            return values
+        if count:
+            columns = zip(*self.packer.iter_unpack(data))
+        else:
+            columns = [()] * len(self.names)
+        codes = [code for code in self.codes if not code.endswith("x")]
+        return RecordArray(self.names, [self._column(code, column)
+                                        for code, column in zip(codes, columns)])
+
+
+def _batch_plan(subcon):
+    """
+    Return a :class:`_BatchPlan` for array elements of this subcon, or False
+    if they cannot be unpacked together.
+
+    Elements must be a number field, or a nested struct made only of number
+    and string fields with unique names and no adapters, except unnamed
+    padding.
+    """
+    from construct.adapters import PaddingAdapter
+
+    while subcon.__class__._parse is Subconstruct._parse and isinstance(subcon, Subconstruct):
+        subcon = subcon.subcon
+
+    if subcon.__class__._parse is FormatField._parse:
+        order, code, adapters = _static_code(subcon)
+        return _BatchPlan(order, [code], None)
+
+    if subcon.__class__ is not Struct or not subcon.nested:
+        return False
+
+    order = ""
+    codes = []
+    names = []
+    for sc in subcon.subcons:
+        static = _static_code(sc)
+        if static is None:
+            return False
+        sc_order, code, adapters = static
+        if sc.name is None:
+            if any(adapter.__class__ is not PaddingAdapter or adapter.strict for adapter in adapters):
+                return False
+            code = code[:-1] + "x"
+        elif adapters or sc.name in names:
+            return False
+        else:
+            names.append(sc.name)
+        if sc_order:
+            if order and sc_order != order:
+                return False
+            order = sc_order
+        codes.append(code)
+    if not names:
+        return False
+    return _BatchPlan(order, codes, names)
+
+
 class MetaArray(Subconstruct):
     """
     An array (repeater) of a meta-count. The array will iterate exactly
@@ -456,26 +611,53 @@ class MetaArray(Subconstruct):
 
         The :func:`~construct.macros.Array` macro, :func:`Range` and :func:`RepeatUntil`.
 
+    In batch mode, arrays of fixed-size elements are read at once and
+    unpacked in a single pass. Byte arrays are returned as ``bytes``, other
+    numbers as an ``array.array``, and structs as a :class:`RecordArray`.
+    Elements that are not fixed-size are parsed one by one, as usual.
+
     :param countfunc: a function that takes the context as a parameter and returns
                       the number of elements of the array (count)
     :param subcon: the subcon to repeat ``countfunc()`` times
+    :param batch: a keyword-only argument to enable batch mode. default is False
 
     Example::
 
         MetaArray(lambda ctx: 5, UBInt8("foo"))
     """
-    __slots__ = ["countfunc"]
+    __slots__ = ["countfunc", "batch", "_plan"]
 
-    def __init__(self, countfunc, subcon):
+    def __init__(self, countfunc, subcon, **kw):
+        self.batch = kw.pop("batch", False)
+        if kw:
+            raise TypeError("the only keyword argument accepted is 'batch'", kw)
         super(MetaArray, self).__init__(subcon)
         self.countfunc = countfunc
+        self._plan = None
         self._clear_flag(self.FLAG_COPY_CONTEXT)
         self._set_flag(self.FLAG_DYNAMIC)
 
+    def __getstate__(self):
+        attrs = super(MetaArray, self).__getstate__()
+        attrs["_plan"] = None
+        return attrs
+
     def _parse(self, stream, context):
+        count = self.countfunc(context)
+        # nothing is read for an empty or negative count, like the loop below
+        if self.batch and count > 0:
+            plan = self._plan
+            if plan is None:
+                plan = self._plan = _batch_plan(self.subcon)
+            if plan:
+                size = plan.packer.size * count
+                data = stream.read(size)
+                if len(data) == size:
+                    return plan.unpack(data, count)
+                # short read; fail exactly like the element by element parse
+                stream = BytesIO(data)
         obj = ListContainer()
         c = 0
-        count = self.countfunc(context)
         try:
             if self.subcon.conflags & self.FLAG_COPY_CONTEXT:
                 while c < count:
@@ -678,6 +860,195 @@ class RepeatUntil(Subconstruct):
 #===============================================================================
 # structures and sequences
 #===============================================================================
+class _StaticRun(object):
+    """
+    Consecutive fixed-size fields of a Struct, unpacked with one ``struct``
+    call. Each field keeps the adapters wrapping it, innermost first, which
+    are applied to the unpacked value.
+    """
+    __slots__ = ["members", "subcons", "adapters", "names", "packer", "size", "private", "unique"]
+
+    def __init__(self, run):
+        order = _run_order(run) or "="
+        self.members = [sc for sc, code in run]
+        # discarded padding is skipped by the packer, and has no value
+        self.subcons = [sc for sc, code in run if not code[1].endswith("x")]
+        self.adapters = [code[2] for sc, code in run if not code[1].endswith("x")]
+        self.names = [sc.name for sc in self.subcons]
+        self.private = False
+        self.unique = False
+        self.packer = Packer(order + "".join(code[1] for sc, code in run))
+        self.size = self.packer.size
+
+
+def _run_order(run):
+    for sc, code in run:
+        if code[0]:
+            return code[0]
+    return ""
+
+
+def _static_code(sc):
+    """
+    Return (byte order, struct code, adapters) for a fixed-size subcon that
+    can be unpacked as part of a larger ``struct`` format, or None.
+
+    Only plain fields qualify, optionally wrapped by adapters and renames
+    that do not change how the stream is read.
+    """
+    if sc.conflags & (sc.FLAG_EMBED | sc.FLAG_DYNAMIC):
+        return None
+    adapters = []
+    while isinstance(sc, Subconstruct):
+        parse = sc.__class__._parse
+        if parse is Adapter._parse:
+            adapters.append(sc)
+        elif parse is not Subconstruct._parse:
+            return None
+        sc = sc.subcon
+    adapters.reverse()
+    parse = sc.__class__._parse
+    if parse is FormatField._parse:
+        fmt = sc.packer.format
+        if isinstance(fmt, bytes):
+            fmt = fmt.decode("ascii")
+        return fmt[0], fmt[1:], adapters
+    if parse is StaticField._parse and isinstance(sc.length, int):
+        return "", "%ds" % sc.length, adapters
+    return None
+
+
+class Record(object):
+    """
+    Base of the slotted record classes made for Structs with ``record=True``.
+
+    Records store each field in a slot, rather than in a dictionary. They
+    support attribute access and the read-only parts of the Container
+    interface, and compare equal to Containers with the same items.
+    """
+    __slots__ = []
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except (AttributeError, TypeError):
+            raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return name in self.__slots__ and hasattr(self, name)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # record classes are made at runtime and can't be found by name, so
+        # they are made again from their name and slots when unpickled
+        return _unpickle_record, (self.__class__.__name__, self.__slots__, self.items())
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__,
+                           ", ".join("%s=%r" % item for item in self.items()))
+
+    def keys(self):
+        return [name for name in self.__slots__ if hasattr(self, name)]
+
+    def values(self):
+        return [getattr(self, name) for name in self.keys()]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.keys()]
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+
+def _record_names(struct):
+    """
+    Return the names of all fields of a Struct, including embedded ones, or
+    None if an embedded subcon is not a Struct.
+    """
+    names = []
+    for sc in struct.subcons:
+        if sc.conflags & Construct.FLAG_EMBED:
+            while sc.__class__ is not Struct and isinstance(sc, Subconstruct):
+                sc = sc.subcon
+            if sc.__class__ is not Struct:
+                return None
+            inner = _record_names(sc)
+            if inner is None:
+                return None
+            names.extend(inner)
+        elif sc.name is not None:
+            names.append(sc.name)
+    return names
+
+
+# a slot with one of these names would hide a method of Record
+_record_reserved = frozenset(dir(Record))
+
+# record classes by (name, slots), shared by structs and unpickled records
+_record_classes = {}
+
+
+def _make_record_class(classname, slots):
+    key = (classname, slots)
+    try:
+        return _record_classes[key]
+    except KeyError:
+        cls = _record_classes[key] = type(classname, (Record,), {"__slots__": slots})
+        return cls
+
+
+def _unpickle_record(classname, slots, items):
+    obj = _make_record_class(classname, tuple(slots))()
+    for name, value in items:
+        setattr(obj, name, value)
+    return obj
+
+
+def _record_class(struct):
+    """
+    Create a :class:`Record` class with a slot for each field of a Struct.
+
+    Returns None when that is not possible, because a field name is not a
+    valid identifier, clashes with a method, or the struct embeds something
+    with unknown fields; those structs parse to Containers.
+    """
+    names = _record_names(struct)
+    if names is None:
+        return None
+    slots = []
+    for name in names:
+        if isinstance(name, bytes):
+            name = name.decode("ascii", "replace")
+        if not name.isidentifier() or name in _record_reserved:
+            return None
+        if name not in slots:
+            slots.append(name)
+    classname = struct.name if isinstance(struct.name, str) else "Record"
+    try:
+        return _make_record_class(classname, tuple(slots))
+    except (TypeError, ValueError):
+        return None
+
+
 class Struct(Construct):
     """
     A sequence of named constructs, similar to structs in C. The elements are
@@ -690,6 +1061,9 @@ class Struct(Construct):
     :param nested: a keyword-only argument that indicates whether this struct
                    creates a nested context. The default is True. This parameter is
                    considered "advanced usage", and may be removed in the future.
+    :param record: a keyword-only argument; if True, parse to instances of a
+                   slotted :class:`Record` class made for this struct, rather
+                   than to Containers. The default is False.
 
     Example::
 
@@ -700,27 +1074,129 @@ class Struct(Construct):
             UBInt8("third_element"),
         )
     """
-    __slots__ = ["subcons", "nested", "allow_overwrite"]
+    __slots__ = ["subcons", "nested", "allow_overwrite", "record", "_steps", "_lazy", "_record"]
 
     def __init__(self, name, *subcons, **kw):
         self.nested = kw.pop("nested", True)
         self.allow_overwrite = kw.pop("allow_overwrite", False)
+        self.record = kw.pop("record", False)
         if kw:
-            raise TypeError("the only keyword argument accepted is 'nested'", kw)
+            raise TypeError("the only keyword arguments accepted are 'nested', "
+                            "'allow_overwrite' and 'record'", kw)
         super(Struct, self).__init__(name)
         self.subcons = subcons
+        self._steps = None
+        self._lazy = False
+        self._record = None
         self._inherit_flags(*subcons)
         self._clear_flag(self.FLAG_EMBED)
 
+    def __getstate__(self):
+        attrs = super(Struct, self).__getstate__()
+        attrs["_steps"] = None
+        attrs["_record"] = None
+        return attrs
+
+    def _compile(self):
+        """
+        Group runs of fixed-size fields into single ``struct`` unpacks.
+
+        Sets the list of steps; each is either a subcon to parse normally,
+        or a :class:`_StaticRun` that reads and unpacks consecutive fields
+        at once. Also finds which runs can skip filling in the context, and
+        creates the record class, if needed.
+        """
+        from construct.adapters import PaddingAdapter
+
+        steps = []
+        run = []
+
+        def flush():
+            if run:
+                steps.append(_StaticRun(run))
+            del run[:]
+
+        for sc in self.subcons:
+            code = _static_code(sc)
+            if code is None:
+                flush()
+                steps.append(sc)
+                continue
+            order, fmt, adapters = code
+            if sc.name is None and adapters and all(
+                    a.__class__ is PaddingAdapter and not a.strict for a in adapters):
+                # unstrict padding is discarded unseen
+                code = order, fmt[:-1] + "x", []
+            run_order = _run_order(run)
+            if order and run_order and order != run_order:
+                flush()
+            run.append((sc, code))
+        flush()
+
+        # the context is only needed by subcons parsed the usual way, and
+        # by adapters; a run followed by neither does not have to fill it in
+        names = [sc.name for sc in self.subcons if sc.name is not None]
+        unique = len(names) == len(set(names)) and not self.conflags & self.FLAG_EMBED and \
+            not any(sc.conflags & self.FLAG_EMBED for sc in self.subcons)
+        private = True
+        for step in reversed(steps):
+            if step.__class__ is _StaticRun:
+                if any(step.adapters):
+                    private = False
+                step.private = private
+                step.unique = unique
+            else:
+                private = False
+        self._lazy = private
+
+        if self.record:
+            self._record = _record_class(self)
+        self._steps = steps
+        return steps
+
     def _parse(self, stream, context):
+        steps = self._steps
+        if steps is None:
+            steps = self._compile()
+        fresh = False
         if "<obj>" in context:
             obj = context["<obj>"]
             del context["<obj>"]
         else:
-            obj = Container()
+            obj = Container() if self._record is None else self._record()
             if self.nested:
-                context = Container(_=context)
-        for sc in self.subcons:
+                fresh = True
+                if not self._lazy:
+                    context = Container(_=context)
+        for step in steps:
+            if step.__class__ is _StaticRun:
+                data = stream.read(step.size)
+                if len(data) != step.size:
+                    # replay the short read field by field, so the error
+                    # raised is the same as without the fast path
+                    self._parse_subcons(step.members, BytesIO(data), context, obj)
+                    continue
+                values = step.packer.unpack(data)
+                if fresh and step.private and step.unique:
+                    fill = Container.__setitem__ if self._record is None else setattr
+                    for name, subobj in zip(step.names, values):
+                        if name is not None:
+                            fill(obj, name, subobj)
+                    continue
+                for sc, adapters, subobj in zip(step.subcons, step.adapters, values):
+                    for adapter in adapters:
+                        subobj = adapter._decode(subobj, context)
+                    if sc.name is not None:
+                        if sc.name in obj and not self.allow_overwrite:
+                            raise OverwriteError("%r would be overwritten but allow_overwrite is False" % (sc.name,))
+                        obj[sc.name] = subobj
+                        context[sc.name] = subobj
+            else:
+                self._parse_subcons((step,), stream, context, obj)
+        return obj
+
+    def _parse_subcons(self, subcons, stream, context, obj):
+        for sc in subcons:
             if sc.conflags & self.FLAG_EMBED:
                 context["<obj>"] = obj
                 sc._parse(stream, context)
@@ -731,7 +1207,6 @@ class Struct(Construct):
                         raise OverwriteError("%r would be overwritten but allow_overwrite is False" % (sc.name,))
                     obj[sc.name] = subobj
                     context[sc.name] = subobj
-        return obj
 
     def _build(self, obj, stream, context):
         if "<unnested>" in context:
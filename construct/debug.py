@@ -3,8 +3,10 @@ Debugging utilities for constructs
 """
 
 import inspect
+import json
 import pdb
 import sys
+import time
 import traceback
 
 from construct.core import Construct, Subconstruct
@@ -138,3 +140,178 @@ class Debugger(Subconstruct):
             print(msg)
         pdb.post_mortem(sys.exc_info()[2])
         print("=" * 80)
+
+
+class Profiler(object):
+    """
+    Records how often each named construct is parsed, how long it takes and
+    how many bytes it consumes, keyed by the dotted path of names from the
+    outermost construct.
+
+    The profiler hooks ``_parse`` of every construct class only while it is
+    enabled, so parsing is not slowed down otherwise. Subconstructs that
+    share the name of their parent, and unnamed constructs, are counted as
+    part of their parent. Fields unpacked together by the fast path of a
+    fixed-size Struct are counted as part of the Struct.
+
+    :param memory: also record the memory still allocated after each parse,
+                   using tracemalloc. this is slow. default is False.
+
+    Example::
+
+        profiler = Profiler()
+        with profiler:
+            sff2_file.parse(data)
+        print(profiler.table())
+    """
+    _active = None
+    columns = ("path", "calls", "cumulative", "self", "bytes", "memory")
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.stats = {}
+        self._stack = [["", None, 0.0]]
+        self._origins = {}
+        self._patched = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+
+    def enable(self):
+        """
+        Start recording.
+        """
+        if Profiler._active is not None:
+            raise RuntimeError("a profiler is already enabled")
+        Profiler._active = self
+        if self.memory:
+            import tracemalloc
+            tracemalloc.start()
+
+        classes = [Construct]
+        while classes:
+            cls = classes.pop()
+            classes.extend(cls.__subclasses__())
+            parse = cls.__dict__.get("_parse")
+            if parse is not None:
+                self._patched.append((cls, parse))
+                setattr(cls, "_parse", self._wrap(parse))
+
+    def disable(self):
+        """
+        Stop recording; the statistics are kept.
+        """
+        for cls, parse in reversed(self._patched):
+            setattr(cls, "_parse", parse)
+        del self._patched[:]
+        if self.memory:
+            import tracemalloc
+            tracemalloc.stop()
+        Profiler._active = None
+
+    def reset(self):
+        """
+        Forget all statistics.
+        """
+        self.stats.clear()
+        self._origins.clear()
+
+    def _wrap(self, parse):
+        call = self._call
+
+        def _parse(construct, stream, context):
+            return call(parse, construct, stream, context)
+        return _parse
+
+    def _call(self, parse, construct, stream, context):
+        name = construct.name
+        parent = self._stack[-1]
+        if len(self._stack) == 1 and id(construct) in self._origins:
+            # lazily parsed subcons, such as those of OnDemand, are parsed
+            # after their parent returns; put them back where they belong
+            origin = self._origins[id(construct)]
+            self._stack.append([origin[0], origin[1], 0.0])
+            try:
+                return self._call(parse, construct, stream, context)
+            finally:
+                self._stack.pop()
+        subcon = getattr(construct, "subcon", None)
+        if name is None or name == parent[1]:
+            if subcon is not None:
+                self._origins[id(subcon)] = parent
+            return parse(construct, stream, context)
+
+        if isinstance(name, bytes):
+            name = name.decode("ascii", "replace")
+        path = parent[0] + "." + name if parent[0] else name
+        frame = [path, construct.name, 0.0]
+        if subcon is not None:
+            self._origins[id(subcon)] = frame
+        self._stack.append(frame)
+        position = _tell(stream)
+        if self.memory:
+            import tracemalloc
+            allocated = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            return parse(construct, stream, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            self._stack[-1][2] += elapsed
+            stat = self.stats.get(path)
+            if stat is None:
+                stat = self.stats[path] = [0, 0.0, 0.0, 0, 0]
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] += elapsed - frame[2]
+            if position is not None:
+                end = _tell(stream)
+                if end is not None:
+                    stat[3] += end - position
+            if self.memory:
+                stat[4] += tracemalloc.get_traced_memory()[0] - allocated
+
+    def report(self, sort="self"):
+        """
+        Return a list of dicts, one per path, ordered by the given column,
+        highest first.
+
+        :param sort: one of "calls", "cumulative", "self", "bytes" or "memory"
+        """
+        rows = [dict(zip(self.columns, (path,) + tuple(stat))) for path, stat in self.stats.items()]
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows
+
+    def table(self, sort="self", limit=None):
+        """
+        Return the report as a text table. Times are in milliseconds.
+
+        :param sort: column to order by; see :meth:`report`
+        :param limit: number of rows to show. default is all.
+        """
+        rows = self.report(sort)[:limit]
+        width = max([len(row["path"]) for row in rows] + [4])
+        lines = ["%-*s %10s %12s %12s %12s %12s" % ((width,) + self.columns)]
+        for row in rows:
+            lines.append("%-*s %10d %12.3f %12.3f %12d %12d" % (
+                width, row["path"], row["calls"], row["cumulative"] * 1000,
+                row["self"] * 1000, row["bytes"], row["memory"]))
+        return "\n".join(lines)
+
+    def to_json(self, sort="self"):
+        """
+        Return the report as a JSON string. Times are in seconds.
+        """
+        return json.dumps(self.report(sort), indent=2)
+
+
+def _tell(stream):
+    try:
+        return stream.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
@@ -282,12 +282,13 @@ def NFloat64(name):
 #===============================================================================
 # arrays
 #===============================================================================
-def Array(count, subcon):
+def Array(count, subcon, batch=False):
     r"""
     Repeats the given unit a fixed number of times.
 
     :param count: number of times to repeat
     :param subcon: construct to repeat
+    :param batch: unpack fixed-size elements all at once; see MetaArray
 
     Example::
 
@@ -305,9 +306,9 @@ def Array(count, subcon):
     """
 
     if callable(count):
-        con = MetaArray(count, subcon)
+        con = MetaArray(count, subcon, batch=batch)
     else:
-        con = MetaArray(lambda ctx: count, subcon)
+        con = MetaArray(lambda ctx: count, subcon, batch=batch)
         con._clear_flag(con.FLAG_DYNAMIC)
     return con
 
@@ -0,0 +1,213 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Index of every file in a MUGEN folder
+=====================================
+
+MUGEN runs on Windows, so file names in character and stage defs are
+matched without regard to case, and may use either slash.  The index maps
+the lower case path of each file, relative to the MUGEN folder, to its
+real path, so files can be found the same way on any system without
+touching the disk.
+
+Folders are listed again only if their mtime changed since the last
+refresh, so keeping the index current is cheap.  The walk can be done
+concurrently, which matters on network shares and spinning disks.
+"""
+import asyncio
+import logging
+import os
+import posixpath
+from bisect import bisect_left
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from os import scandir
+from os.path import join
+
+logger = logging.getLogger('AssetIndex')
+
+
+def index_key(path):
+    """ Return the key of a relative path; lower case, / separated, normalized
+
+    :param path: path relative to the MUGEN folder, with / or \\
+    :return: str
+    """
+    key = posixpath.normpath(path.replace('\\', '/')).lower()
+    return '' if key == '.' else key
+
+
+class AssetIndex:
+    """ Case insensitive index of all files in a folder
+    """
+
+    def __init__(self, root):
+        """
+
+        :param root: MUGEN folder
+        """
+        self.root = root
+        # relative folder: (mtime, subfolder names, file names)
+        self._folders = dict()
+        self._paths = dict()
+        self._names = defaultdict(list)
+        self._keys = list()
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path):
+        return index_key(path) in self._paths
+
+    def refresh(self):
+        """ Walk the folder and update the index
+
+        Folders with the same mtime as the last refresh are not listed.
+        """
+        folders = dict()
+        listed = 0
+        stack = ['']
+        while stack:
+            folder = stack.pop()
+            result = self._list(folder)
+            if result is None:
+                continue
+            mtime, subfolders, files, changed = result
+            listed += changed
+            folders[folder] = mtime, subfolders, files
+            stack.extend(posixpath.join(folder, name) for name in subfolders)
+        self._finish(folders, listed)
+
+    async def refresh_async(self, max_workers=8):
+        """ Like refresh, but list folders concurrently in a thread pool
+
+        Yields (relative folder, file name) for every file, as soon as its
+        folder is done, so the walk can feed other work.  The index is
+        updated once the walk is finished.
+
+        :param max_workers: maximum number of folders listed at once
+        """
+        loop = asyncio.get_event_loop()
+        folders = dict()
+        listed = 0
+        with ThreadPoolExecutor(max_workers) as executor:
+            pending = {loop.run_in_executor(executor, self._list, ''): ''}
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    folder = pending.pop(future)
+                    result = future.result()
+                    if result is None:
+                        continue
+                    mtime, subfolders, files, changed = result
+                    listed += changed
+                    folders[folder] = mtime, subfolders, files
+                    for name in subfolders:
+                        subfolder = posixpath.join(folder, name)
+                        pending[loop.run_in_executor(executor, self._list, subfolder)] = subfolder
+                    for name in files:
+                        yield folder, name
+        self._finish(folders, listed)
+
+    def _list(self, folder):
+        """ Return (mtime, subfolder names, file names, True if listed) of
+        a relative folder, or None if it can't be read
+        """
+        path = join(self.root, folder)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+        cached = self._folders.get(folder)
+        if cached is not None and cached[0] == mtime:
+            return mtime, cached[1], cached[2], False
+
+        subfolders, files = list(), list()
+        try:
+            with scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subfolders.append(entry.name)
+                    else:
+                        files.append(entry.name)
+        except OSError:
+            return None
+        return mtime, subfolders, files, True
+
+    def _finish(self, folders, listed):
+        self._folders = folders
+        self._rebuild()
+        logger.debug('%d folders, %d listed, %d files', len(folders), listed, len(self._paths))
+
+    def _rebuild(self):
+        paths = dict()
+        names = defaultdict(list)
+        for folder, (mtime, subfolders, files) in self._folders.items():
+            for name in files:
+                real = join(self.root, folder, name)
+                paths[index_key(posixpath.join(folder, name))] = real
+                names[name.lower()].append(real)
+        self._paths = paths
+        self._names = names
+        self._keys = sorted(paths)
+
+    def get(self, path):
+        """ Return the real path of a file, or None
+
+        :param path: path relative to the MUGEN folder; any case, / or \\
+        """
+        return self._paths.get(index_key(path))
+
+    def find_name(self, name):
+        """ Return the real paths of all files with a name, in any folder
+
+        :param name: file name; any case
+        :rtype: list
+        """
+        return list(self._names.get(name.lower(), ()))
+
+    def prefix(self, prefix):
+        """ Return the real paths of all files with a relative path starting
+        with some text
+
+        :param prefix: start of a relative path; any case
+        :rtype: list
+        """
+        prefix = prefix.replace('\\', '/').lower()
+        return [self._paths[key] for key in self._keys_from(prefix)]
+
+    def in_folder(self, folder, recursive=False):
+        """ Return the real paths of the files in a folder
+
+        :param folder: folder relative to the MUGEN folder; any case
+        :param recursive: also return files in subfolders
+        :rtype: list
+        """
+        key = index_key(folder)
+        prefix = key + '/' if key else ''
+        start = len(prefix)
+        return [self._paths[key] for key in self._keys_from(prefix)
+                if recursive or '/' not in key[start:]]
+
+    def _keys_from(self, prefix):
+        keys = self._keys
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            key = keys[i]
+            if not key.startswith(prefix):
+                break
+            yield key
@@ -0,0 +1,217 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Persistent cache of decoded sprites
+===================================
+
+Decoded sprites are stored on disk with their palette, so a warm start
+can draw them without opening the SFF file at all.
+
+Entries are keyed by the content hash of the SFF file.  The hash is
+remembered with the size and mtime of the file, and is only computed
+again when either of them change.  The cache is trimmed to a maximum
+size by removing the least recently used entries.
+"""
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import zlib
+from os.path import abspath, basename, dirname, join
+
+from libmugen.sff import DecodedSprite, SFFFile
+
+logger = logging.getLogger('SpriteCache')
+
+# width, height, axisx, axisy, then a 768 byte palette and the pixels
+entry_header_struct = struct.Struct('<4H768s')
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """ Return the sha1 hex digest of a file's contents
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def replace_file(path, data):
+    """ Write a file through a temporary file of its own, then rename it
+
+    Each writer gets a unique temporary name, so processes writing the same
+    file at once can't mix their data; the last rename wins.
+    """
+    with tempfile.NamedTemporaryFile(dir=dirname(path), prefix=basename(path) + '.',
+                                     suffix='.tmp', delete=False) as fp:
+        fp.write(data)
+    try:
+        os.replace(fp.name, path)
+    except OSError:
+        os.unlink(fp.name)
+        raise
+
+
+def pack_sprite(sprite):
+    palette = b''.join(bytes(color[:3]) for color in sprite.palette[:256])
+    header = entry_header_struct.pack(sprite.width, sprite.height,
+                                      sprite.axisx, sprite.axisy, palette)
+    return header + zlib.compress(bytes(sprite.pixels))
+
+
+def unpack_sprite(data):
+    width, height, axisx, axisy, palette = entry_header_struct.unpack_from(data)
+    pixels = zlib.decompress(data[entry_header_struct.size:])
+    colors = [tuple(palette[i:i + 3]) for i in range(0, 768, 3)]
+    return DecodedSprite(width, height, axisx, axisy, colors, pixels)
+
+
+class SpriteCache:
+    """ On disk cache of decoded, palette applied sprites
+    """
+    index_filename = 'index.json'
+
+    def __init__(self, root, max_size=256 * 1024 * 1024):
+        """
+
+        :param root: folder to store the cache in; created if needed
+        :param max_size: maximum size of all entries, in bytes
+        """
+        self.root = root
+        self.max_size = max_size
+        self._hashes = dict()
+        self._total_size = None
+        self._dirty = False
+
+        os.makedirs(root, exist_ok=True)
+        try:
+            with open(join(root, self.index_filename)) as fp:
+                self._hashes = json.load(fp)
+        except (OSError, ValueError):
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.save()
+
+    def save(self):
+        """ Write the file hash index, if it changed
+        """
+        if not self._dirty:
+            return
+
+        path = join(self.root, self.index_filename)
+        replace_file(path, json.dumps(self._hashes).encode())
+        self._dirty = False
+
+    def content_hash(self, path):
+        """ Return the content hash of a file, computing it only if changed
+
+        :param path: path to the file
+        :return: str
+        """
+        path = abspath(path)
+        stat = os.stat(path)
+        try:
+            size, mtime, digest = self._hashes[path]
+            if size == stat.st_size and mtime == stat.st_mtime_ns:
+                return digest
+        except KeyError:
+            pass
+
+        digest = hash_file(path)
+        self._hashes[path] = stat.st_size, stat.st_mtime_ns, digest
+        self._dirty = True
+        return digest
+
+    def entry_path(self, path, groupno, itemno):
+        key = '{}-{}-{}'.format(self.content_hash(path), groupno, itemno)
+        return join(self.root, key + '.spr')
+
+    def get(self, path, groupno, itemno):
+        """ Return a cached sprite, or None
+
+        :rtype: libmugen.sff.DecodedSprite
+        """
+        filename = self.entry_path(path, groupno, itemno)
+        try:
+            with open(filename, 'rb') as fp:
+                data = fp.read()
+        except FileNotFoundError:
+            return None
+
+        # mark as recently used
+        os.utime(filename)
+        return unpack_sprite(data)
+
+    def put(self, path, groupno, itemno, sprite):
+        """ Store a decoded sprite
+
+        :type sprite: libmugen.sff.DecodedSprite
+        """
+        filename = self.entry_path(path, groupno, itemno)
+        data = pack_sprite(sprite)
+        replace_file(filename, data)
+
+        if self._total_size is not None:
+            self._total_size += len(data)
+        self.trim()
+
+    def load(self, path, groupno, itemno):
+        """ Return a sprite from the cache, decoding and storing it if needed
+
+        :raises KeyError: the sprite is not in the SFF file
+        :rtype: libmugen.sff.DecodedSprite
+        """
+        sprite = self.get(path, groupno, itemno)
+        if sprite is None:
+            with SFFFile(path) as sff_file:
+                sprite = sff_file.sprite(groupno, itemno)
+            self.put(path, groupno, itemno, sprite)
+        return sprite
+
+    def trim(self):
+        """ Remove least recently used entries until under max_size
+        """
+        if self._total_size is not None and self._total_size <= self.max_size:
+            return
+
+        entries = list()
+        for entry in os.scandir(self.root):
+            if entry.name.endswith('.spr'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        self._total_size = sum(i[1] for i in entries)
+        if self._total_size <= self.max_size:
+            return
+
+        entries.sort()
+        for mtime, size, filename in entries:
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+            self._total_size -= size
+            logger.debug('evicted %s', filename)
+            if self._total_size <= self.max_size:
+                break
@@ -18,7 +18,7 @@
 import shutil
 from os.path import basename, dirname
 
-from libmugen.path import get_config
+from libmugen.config import get_config
 
 
 class Character:
@@ -0,0 +1,207 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+State definitions of CNS files
+==============================
+
+MugenParser merges sections with the same name, but a CNS file is full of
+them: every `[State 200, x]' controller may share its name with others.
+This module keeps every Statedef and state controller in file order, so
+the logic of a character can be checked or changed.
+
+Options are kept as (key, value) pairs, since keys like trigger1 may be
+repeated.  Keys and controller types are interned, as there are only a
+few hundred different ones across any number of files.
+"""
+import re
+from sys import intern
+
+from libmugen.encoding import read_text
+from libmugen.parse import iter_config
+
+statedef_regex = re.compile(r'statedef\s+(-?\d+)')
+state_regex = re.compile(r'state\s+(-?\d+)?\s*(?:,\s*(.*))?$')
+
+
+class Section:
+    """ A section that is not part of a state; [Data], [Size], etc
+    """
+    __slots__ = ('name', 'lineno', 'options')
+
+    def __init__(self, name, lineno):
+        self.name = name
+        self.lineno = lineno
+        self.options = list()
+
+    def __repr__(self):
+        return '<{} [{}]>'.format(self.__class__.__name__, self.name)
+
+    def get(self, key, default=None):
+        """ Return the value of the first option with a key
+
+        :param key: lower case option name
+        """
+        for name, value in self.options:
+            if name == key:
+                return value
+        return default
+
+    def get_all(self, key):
+        """ Return the values of all options with a key, in order
+
+        :param key: lower case option name
+        """
+        return [value for name, value in self.options if name == key]
+
+
+class Controller(Section):
+    """ A state controller; `[State 200, label]'
+    """
+    __slots__ = ('type', 'label')
+
+    def __init__(self, name, lineno, label):
+        super().__init__(name, lineno)
+        self.type = None
+        self.label = label
+
+
+class Statedef(Section):
+    """ A state, with its options and controllers
+    """
+    __slots__ = ('number', 'controllers', '_by_type')
+
+    def __init__(self, name, lineno, number):
+        super().__init__(name, lineno)
+        self.number = number
+        self.controllers = list()
+        self._by_type = dict()
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self.number)
+
+    def add(self, controller):
+        self.controllers.append(controller)
+
+    def index(self, controller):
+        """ Make a controller found by its type; done once the type is read
+        """
+        key = controller.type.lower()
+        try:
+            self._by_type[key].append(controller)
+        except KeyError:
+            self._by_type[key] = [controller]
+
+    def of_type(self, kind):
+        """ Return all controllers of a type, in file order
+
+        :param kind: controller type, like 'HitDef'; any case
+        :rtype: list
+        """
+        return self._by_type.get(kind.lower(), [])
+
+
+class CNS:
+    """ Every state and section of one or more CNS files, in file order
+    """
+
+    def __init__(self):
+        self.statedefs = list()
+        self.sections = list()
+        self.orphans = list()
+        self._by_number = dict()
+
+    def statedef(self, number):
+        """ Return the first Statedef with a number, like MUGEN does
+
+        :raises KeyError: no such state
+        :rtype: Statedef
+        """
+        return self._by_number[number][0]
+
+    def statedefs_numbered(self, number):
+        """ Return every Statedef with a number, including duplicates
+        """
+        return self._by_number.get(number, [])
+
+    def controllers(self, number, kind):
+        """ Return controllers of a type in the first Statedef with a number
+
+        :param number: state number
+        :param kind: controller type, like 'HitDef'; any case
+        :rtype: list
+        """
+        try:
+            return self.statedef(number).of_type(kind)
+        except KeyError:
+            return []
+
+    def add(self, statedef):
+        self.statedefs.append(statedef)
+        self._by_number.setdefault(statedef.number, []).append(statedef)
+
+    def read(self, source):
+        """ Add the states of a file
+
+        :param source: contents of a CNS file, or an open text file
+        """
+        current = None
+        statedef = None
+        for section, key, value, lineno in iter_config(source):
+            if key is None:
+                current = self._new_section(section, lineno)
+                if current.__class__ is Statedef:
+                    statedef = current
+                elif current.__class__ is Section:
+                    statedef = None
+                elif statedef is None:
+                    self.orphans.append(current)
+                else:
+                    statedef.add(current)
+                continue
+
+            key = intern(key)
+            current.options.append((key, value))
+            if key == 'type' and current.__class__ is Controller and current.type is None:
+                current.type = intern(value)
+                if statedef is not None:
+                    statedef.index(current)
+
+    def _new_section(self, name, lineno):
+        match = statedef_regex.match(name)
+        if match:
+            statedef = Statedef(name, lineno, int(match.group(1)))
+            self.add(statedef)
+            return statedef
+
+        match = state_regex.match(name)
+        if match:
+            return Controller(name, lineno, match.group(2))
+
+        section = Section(name, lineno)
+        self.sections.append(section)
+        return section
+
+
+def load_cns(path):
+    """ Read a CNS file
+
+    :param path: path to the file
+    :rtype: CNS
+    """
+    cns = CNS()
+    cns.read(read_text(path))
+    return cns
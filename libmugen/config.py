@@ -15,23 +15,34 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
+import asyncio
+import json
+import logging
+import os
 import re
+import threading
+from collections import OrderedDict
+from os.path import abspath, join
 
+from libmugen.encoding import read_text
 from libmugen.parse import MugenParser
 
+logger = logging.getLogger('ConfigCache')
+
 match_timeout = 15
 strip0_regex = re.compile(';.*?\n')
 strip1_regex = re.compile(':.*\n')
 strip2_regex = re.compile('[;:].*\n')
 
 
-def get_config(path):
-    # open the file, while ignoring encoding errors (usually comments)
-    # errors="surrogateescape" is used to ignore unknown characters if the
+def read_config(path):
+    """ Parse a config file, without using the cache
+
+    :rtype: libmugen.parse.MugenParser
+    """
+    # unknown characters are kept with errors="surrogateescape" if the
     # encoding is incorrectly guessed.  Shift-JIS seems to give many errors
-    encoding = 'ascii'
-    with open(path, encoding=encoding, errors='surrogateescape') as fp:
-        data = fp.read()
+    data = read_text(path)
 
     config = MugenParser()
     config.read_string(data)
@@ -39,6 +50,199 @@ def get_config(path):
     return config
 
 
+def get_config(path):
+    """ Return the parsed config file, from the shared cache if unchanged
+
+    The parser returned may be shared, so don't change it.
+
+    :rtype: libmugen.parse.MugenParser
+    """
+    return config_cache.get(path)
+
+
+class ConfigCache:
+    """ Parsed config files, keyed by path and checked against size and mtime
+
+    Only the most recently used files are kept.
+    """
+
+    def __init__(self, max_size=1024):
+        """
+
+        :param max_size: maximum number of files to keep parsed
+        """
+        self.max_size = max_size
+        self._configs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.save()
+
+    def __len__(self):
+        return len(self._configs)
+
+    def __getstate__(self):
+        # parsed files are not kept when pickled
+        state = self.__dict__.copy()
+        state['_configs'] = OrderedDict()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """ Return a parsed config file, parsing it only if changed
+
+        :param path: path to the file
+        :rtype: libmugen.parse.MugenParser
+        """
+        path, key = self._key(path)
+        config = self._lookup(path, key)
+        if config is None:
+            config = self.load(path, key)
+            self._insert(path, key, config)
+        return config
+
+    async def get_async(self, path, executor=None):
+        """ Like get, but parse the file in an executor
+
+        Parsers can be pickled, so a ProcessPoolExecutor may be used.
+
+        :param path: path to the file
+        :param executor: executor to parse in; default is the loop's
+        :rtype: libmugen.parse.MugenParser
+        """
+        path, key = self._key(path)
+        config = self._lookup(path, key)
+        if config is None:
+            config = await self.load_async(path, key, executor)
+            self._insert(path, key, config)
+        return config
+
+    def load(self, path, key):
+        """ Parse a file that is not in the cache
+
+        :param key: (size, mtime) of the file
+        """
+        return read_config(path)
+
+    async def load_async(self, path, key, executor):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, read_config, path)
+
+    def _key(self, path):
+        path = abspath(path)
+        stat = os.stat(path)
+        return path, (stat.st_size, stat.st_mtime_ns)
+
+    def _lookup(self, path, key):
+        with self._lock:
+            try:
+                entry = self._configs[path]
+            except KeyError:
+                return None
+            if entry[0] != key:
+                return None
+            self._configs.move_to_end(path)
+            return entry[1]
+
+    def _insert(self, path, key, config):
+        with self._lock:
+            self._configs[path] = key, config
+            self._configs.move_to_end(path)
+            while len(self._configs) > self.max_size:
+                self._configs.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._configs.clear()
+
+    def save(self):
+        pass
+
+
+class PersistentConfigCache(ConfigCache):
+    """ Config cache that is also stored in a file in the MUGEN folder
+
+    The contents of every file parsed are kept on disk, so the next scan can
+    skip parsing files that have not changed.
+    """
+    cache_filename = 'libmugen-config-cache.json'
+
+    def __init__(self, root, max_size=1024):
+        """
+
+        :param root: MUGEN folder to store the cache in
+        :param max_size: maximum number of files to keep parsed in memory
+        """
+        super().__init__(max_size)
+        self.path = join(root, self.cache_filename)
+        self._stored = dict()
+        self._dirty = False
+
+        try:
+            with open(self.path) as fp:
+                self._stored = json.load(fp)
+        except (OSError, ValueError):
+            pass
+
+    def load(self, path, key):
+        config = self._restore(path, key)
+        if config is None:
+            config = read_config(path)
+            self._remember(path, key, config)
+        return config
+
+    async def load_async(self, path, key, executor):
+        config = self._restore(path, key)
+        if config is None:
+            config = await super().load_async(path, key, executor)
+            self._remember(path, key, config)
+        return config
+
+    def _restore(self, path, key):
+        try:
+            size, mtime, sections = self._stored[path]
+        except KeyError:
+            return None
+        if (size, mtime) != key:
+            return None
+        config = MugenParser()
+        config.read_dict(sections)
+        return config
+
+    def _remember(self, path, key, config):
+        sections = {name: dict(section) for name, section in config.items()
+                    if name != config.default_section}
+        with self._lock:
+            self._stored[path] = key + (sections,)
+            self._dirty = True
+
+    def save(self):
+        """ Write the cache file, if it changed
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._stored)
+            self._dirty = False
+
+        temp = self.path + '.tmp'
+        with open(temp, 'w') as fp:
+            fp.write(data)
+        os.replace(temp, self.path)
+        logger.debug('saved %d configs', len(self._stored))
+
+
+# shared by get_config, MugenRoot, and the character and stage loaders
+config_cache = ConfigCache()
+
+
 def strip_comments(data):
     # comments start with ; so strip them
     # for whatever S@#)$*! reason, : comments are also allowed
@@ -18,13 +18,15 @@
 import os
 import asyncio
 import logging
-from collections import defaultdict
-from os.path import dirname, join, basename
+from concurrent.futures import ProcessPoolExecutor
+from os.path import basename, dirname, join, relpath
 
-from libmugen.path import async_exists, gather_required_files, is_path, scantree
-from libmugen.character import get_config, move_character, new_character
-from libmugen.stage import move_stage, new_stage
-from libmugen.config import guess_kind, is_mugen_config
+from libmugen.path import DirectoryIndex, gather_required_files, is_path, scantree
+from libmugen.assets import AssetIndex
+from libmugen.character import Character, move_character, new_character
+from libmugen.stage import Stage, move_stage, new_stage
+from libmugen.config import config_cache, guess_kind
+from libmugen.manifest import Manifest
 
 
 class MugenRoot:
@@ -35,12 +37,25 @@ class MugenRoot:
 
     logger = logging.getLogger('MugenRoot')
 
-    def __init__(self, root):
-        self._stages = set()
-        self._characters = set()
+    # maximum number of folders listed at once while scanning
+    walk_workers = 8
+
+    def __init__(self, root, configs=None, manifest=None, results=None):
+        """
+
+        :param root: MUGEN folder
+        :param configs: libmugen.config.ConfigCache; default is the shared cache
+        :param manifest: libmugen.manifest.Manifest of the last scan, if any
+        :param results: libmugen.results.ResultsStore to record checks in, if any
+        """
+        self._stages = dict()
+        self._characters = dict()
         self.root = root
-        self.files_in_context = defaultdict(set)
-        self.extended_asset_cache = dict()
+        self.assets = AssetIndex(root)
+        self.directories = DirectoryIndex()
+        self.configs = config_cache if configs is None else configs
+        self.manifest = Manifest() if manifest is None else manifest
+        self.results = results
 
         # config
         self.factories = {
@@ -51,77 +66,164 @@ class MugenRoot:
 
     @property
     def characters(self):
-        return self._characters
+        return set(self._characters.values())
 
     @property
     def stages(self):
-        return self._stages
+        return set(self._stages.values())
 
-    async def scan_root(self):
+    async def scan_root(self, executor=None):
         """ Find what characters and stages are available
 
+        The scan is a pipeline: folders are listed concurrently in a thread
+        pool, and each .def is parsed in a process pool as soon as it is
+        found.  The same walk builds the index of every file in the mugen
+        folder, so files are only verified once the walk is done and the
+        index is complete.
+
+        Only files that are new or changed since the last scan, or with
+        assets that changed, are processed again; the rest are restored
+        from the manifest.
+
+        :param executor: executor to parse files in; default is a new
+                         ProcessPoolExecutor for the scan
         :return:
         """
         self.logger.debug('starting scan of mugen folder...')
+        if executor is None:
+            with ProcessPoolExecutor() as executor:
+                return await self.scan_root(executor)
+
         tasks = set()
+        seen = set()
+        indexed = asyncio.Event()
+        self.directories.validate()
 
-        # first do a deep scan of all the files in the mugen root
+        # do a deep scan of all the files in the mugen root
         # i'm not sure, but it seems that mugen doesn't care where
         # certain files are, as long as they exist somewhere
-        # for entry in scantree(self.root):
-        #     path = entry.path
-        #     ext = entry.path[-4:]
-        #     if ext in self.mugen_assets:
-        #         filename = basename(path)
-        #         if filename in self.files_in_context:
-        #             pass
-        #         self.files_in_context[filename].add(path)
-
-        path = os.path.join(self.root, 'chars')
-        for entry in filter(is_mugen_config, scantree(path)):
-            config = get_config(entry.path)
-            kind = guess_kind(config)
-            factory = self.factories.get(kind)
-            if factory is None:
-                # print(entry.path, factory)
-                # print(config.sections())
+        async for folder, name in self.assets.refresh_async(self.walk_workers):
+            parts = folder.split('/')
+            if parts[0] != 'chars' or not name.endswith('.def'):
                 continue
-
-            root = None # TODO THIS
-            task = factory(config, root, entry.path)
+            path = os.path.join(self.root, *parts, name)
+            seen.add(path)
+            task = asyncio.ensure_future(self.scan_file(path, executor, indexed))
             tasks.add(task)
+        indexed.set()
+
+        # files deleted since the last scan
+        for path in set(self.manifest.entries) - seen:
+            self.forget(path)
+            self.manifest.remove(path)
 
         # wait for all of the scans to finish
-        await asyncio.gather(*tasks)
+        restored = sum(await asyncio.gather(*tasks))
+        self.logger.debug('%d files unchanged, %d processed', restored, len(tasks) - restored)
+        self.manifest.save()
+        self.configs.save()
+
+    async def scan_file(self, path, executor, indexed=None):
+        """ Process one config file, unless it is unchanged
+
+        :param path: path to the config file
+        :param indexed: asyncio.Event set when the asset index is complete;
+                        the file is parsed at once, but only verified after
+        :return: True if the file was restored from the manifest
+        """
+        loop = asyncio.get_event_loop()
+        if await loop.run_in_executor(None, self.is_current, path):
+            self.restore(path)
+            return True
+
+        self.forget(path)
+        config = await self.configs.get_async(path, executor)
+        kind = guess_kind(config)
+        factory = self.factories.get(kind)
+        if factory is None:
+            # print(entry.path, factory)
+            # print(config.sections())
+            await self.record(path, kind)
+            return False
+
+        if indexed is not None:
+            await indexed.wait()
+
+        root = None # TODO THIS
+        await factory(config, root, path)
+        return False
+
+    def is_current(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return self.manifest.is_current(path, stat)
+
+    def restore(self, path):
+        """ Add a character or stage from the manifest, without parsing it
+        """
+        entry = self.manifest.get(path)
+        get = entry.info.get
+        if entry.kind == 'character':
+            character = Character(get('name'), get('displayname'),
+                                  basename(path)[:-4], None, path)
+            character.status = entry.status
+            self._characters[path] = character
+        elif entry.kind == 'stage':
+            self._stages[path] = Stage(get('name'), basename(path)[:-4], path)
+
+    async def record(self, path, kind, status=None, info=None, assets=()):
+        """ Store what was found for a config file in the manifest
+
+        Recording stats the file and all of its assets, so it is done in
+        the executor.  See libmugen.manifest.Manifest.record.
+        """
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.manifest.record, path, kind,
+                                   status, info, assets)
+
+    def forget(self, path):
+        self._characters.pop(path, None)
+        self._stages.pop(path, None)
 
     async def process_character(self, config, root, path):
         character = new_character(config, root, path)
         await self.register_character(character)
 
-    async def process_stage(self, config, path):
+    async def process_stage(self, config, root, path):
         stage = new_stage(config, path)
         await self.register_stage(stage)
 
     async def register_character(self, character):
         if await self.verify_character(character):
-            self._characters.add(character)
+            self._characters[character.path] = character
         else:
             pass
 
     async def verify_character(self, character):
-        config = get_config(character.path)
+        config = self.configs.get(character.path)
         try:
-            await gather_required_files(self, character.path, config)
+            required = await gather_required_files(self, character.path, config)
             character.status = "good"
-            return True
         except FileNotFoundError:
+            required = ()
             character.status = "broken"
-            return False
+
+        info = {'name': character.name, 'displayname': character.displayname}
+        await self.record(character.path, 'character', character.status, info, required)
+        if self.results is not None:
+            # hashing may read every file of the character
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self.results.record_verification,
+                                       character.path, required, character.status)
+        return character.status == "good"
 
     async def register_stage(self, stage):
-        return
+        self._stages[stage.path] = stage
+        await self.record(stage.path, 'stage', info={'name': stage.name})
 
-    def migrate_root(self, root):
+    async def migrate_root(self, root):
         """ Move this instance of mugen to a new working folder
 
         This is useful for isolating buggy characters and stages
@@ -133,7 +235,7 @@ class MugenRoot:
             move_character(char, root)
 
         for stage in self.stages:
-            move_stage(stage, root)
+            await move_stage(self, stage, root)
 
     async def find_asset(self, root, filename):
         """ Emulate the awful, awful behavior of mugen file finding
@@ -149,8 +251,8 @@ class MugenRoot:
         # search the obvious place first
         # the filename is likely to be relative to the root of
         # the actual config file.
-        candidate = join(root, filename)
-        if await async_exists(candidate):
+        candidate = await self.resolve(root, filename)
+        if candidate:
             return candidate
 
         # check if the filename/path is relative to the path of the def
@@ -159,26 +261,32 @@ class MugenRoot:
             # it is a path, so check around for it in other places
 
             # maybe it was an absolute path, (from mugen root?)
-            candidate = join(self.root, filename)
-            if await async_exists(candidate):
+            candidate = await self.resolve(self.root, filename)
+            if candidate:
                 return candidate
 
         else:
             # just a filename, so look in the extended folders
             # do an extended search across all content folders
-            folders = [join(self.root, i) for i in self.extended_asset_folders]
-            for folder in folders:
-                candidate = join(folder, filename)
-
-                try:
-                    if self.extended_asset_cache[candidate]:
-                        return candidate
-
-                except KeyError:
-                    exists = await async_exists(candidate)
-                    self.extended_asset_cache[candidate] = exists
-                    if exists:
-                        return candidate
+            for folder in self.extended_asset_folders:
+                candidate = await self.resolve(join(self.root, folder), filename)
+                if candidate:
+                    return candidate
 
         print('missing', root, filename)
         raise FileNotFoundError
+
+    async def resolve(self, folder, filename):
+        """ Return the real path of a file relative to a folder, or None
+
+        Case is ignored, like on Windows.  Files in the MUGEN folder are
+        found in the asset index; others by listing their folders.
+        """
+        try:
+            local = relpath(folder, self.root)
+        except ValueError:
+            local = os.pardir
+
+        if self.assets and not local.startswith(os.pardir):
+            return self.assets.get(join(local, filename))
+        return await self.directories.resolve_async(folder, filename)
@@ -0,0 +1,111 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Text encoding of config files
+=============================
+
+Most files are plain ASCII, but many characters come from Japan and are
+written in Shift-JIS, and some newer ones are UTF-8.  Running chardet over
+a whole file is slow, so only the first few kilobytes are checked: if they
+decode as UTF-8 or Shift-JIS (cp932) that is used, and chardet is only
+asked when neither does.
+
+Guesses are remembered with the size and mtime of the file, so a file is
+only checked again after it changes.  Text is always decoded with
+errors="surrogateescape", so a wrong guess will not stop a file from
+loading.
+"""
+import codecs
+import os
+from os.path import abspath
+
+import chardet
+
+# number of bytes checked at the start of a file
+sniff_size = 64 * 1024
+
+_guesses = dict()
+
+
+def guess_encoding(data):
+    """ Guess the encoding of the start of a file
+
+    The data may end in the middle of a character.
+
+    :param data: first bytes of a file
+    :type data: bytes
+    :return: str
+    """
+    if data.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+
+    if data.isascii():
+        return 'ascii'
+
+    for encoding in ('utf-8', 'cp932'):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(data, final=False)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+
+    guess = chardet.detect(data)
+    return guess['encoding'] or 'ascii'
+
+
+def detect_encoding(path, data=None):
+    """ Return the encoding of a file, guessing it only if the file changed
+
+    :param path: path to the file
+    :param data: first bytes of the file, if already read
+    :return: str
+    """
+    path = abspath(path)
+    stat = os.stat(path)
+    try:
+        size, mtime, encoding = _guesses[path]
+        if size == stat.st_size and mtime == stat.st_mtime_ns:
+            return encoding
+    except KeyError:
+        pass
+
+    if data is None:
+        with open(path, 'rb') as fp:
+            data = fp.read(sniff_size)
+
+    encoding = guess_encoding(data[:sniff_size])
+    _guesses[path] = stat.st_size, stat.st_mtime_ns, encoding
+    return encoding
+
+
+def read_text(path):
+    """ Read and decode a text file
+
+    :param path: path to the file
+    :return: str
+    """
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    encoding = detect_encoding(path, data)
+    return data.decode(encoding, errors='surrogateescape')
+
+
+def clear_cache():
+    """ Forget all guessed encodings
+    """
+    _guesses.clear()
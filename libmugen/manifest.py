@@ -0,0 +1,175 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Manifest of scanned config files
+================================
+
+Remembers what a scan of a MUGEN folder found for each .def file: its
+size and mtime, what kind of file it is, whether it works, the info needed
+to list it, and the size and mtime of every file it needs.  A later scan
+only has to process the files that are new or changed, or whose assets
+changed.
+
+The manifest has a version; a file written by an older version is ignored
+and everything is scanned again.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger('Manifest')
+
+
+class ManifestEntry:
+    """ What was found for one config file
+    """
+    __slots__ = ('size', 'mtime', 'kind', 'status', 'info', 'assets')
+
+    def __init__(self, size, mtime, kind, status=None, info=None, assets=None):
+        self.size = size
+        self.mtime = mtime
+        self.kind = kind
+        self.status = status
+        self.info = info or dict()
+        self.assets = assets or dict()
+
+    def to_json(self):
+        return [self.size, self.mtime, self.kind, self.status, self.info, self.assets]
+
+    def matches(self, stat):
+        """ Check if a file is unchanged since the entry was made
+
+        :param stat: os.stat_result of the config file
+        """
+        return self.size == stat.st_size and self.mtime == stat.st_mtime_ns
+
+    def assets_changed(self):
+        """ Check if any of the files used by the config changed or are gone
+        """
+        for path, (size, mtime) in self.assets.items():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return True
+            if size != stat.st_size or mtime != stat.st_mtime_ns:
+                return True
+        return False
+
+
+class Manifest:
+    """ Scan results of a MUGEN folder, optionally kept in a file
+    """
+    version = 1
+
+    def __init__(self, path=None):
+        """
+
+        :param path: file to keep the manifest in, or None to keep it in memory
+        """
+        self.path = path
+        self.entries = dict()
+        self._dirty = False
+
+        if path is None:
+            return
+
+        try:
+            with open(path) as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') != self.version:
+            logger.debug('ignoring manifest version %s', data.get('version'))
+            return
+
+        for filename, values in data['entries'].items():
+            self.entries[filename] = ManifestEntry(*values)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.save()
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, path):
+        """ Return the entry of a config file, or None
+
+        :rtype: ManifestEntry
+        """
+        return self.entries.get(path)
+
+    def is_current(self, path, stat):
+        """ Check if a config file and its assets have not changed
+
+        Broken files are never current, since a missing file may be added.
+
+        :param path: path to the config file
+        :param stat: os.stat_result of the config file
+        """
+        entry = self.entries.get(path)
+        if entry is None or not entry.matches(stat):
+            return False
+        if entry.kind == 'character' and entry.status != 'good':
+            return False
+        return not entry.assets_changed()
+
+    def record(self, path, kind, status=None, info=None, assets=()):
+        """ Store what was found for a config file
+
+        :param path: path to the config file
+        :param kind: see libmugen.config.guess_kind
+        :param status: 'good', 'broken' or None
+        :param info: dict of values needed to list the file without parsing
+        :param assets: paths of the files the config needs
+        """
+        stat = os.stat(path)
+        asset_stats = dict()
+        for asset in assets:
+            try:
+                asset_stat = os.stat(asset)
+            except OSError:
+                continue
+            asset_stats[asset] = asset_stat.st_size, asset_stat.st_mtime_ns
+        self.entries[path] = ManifestEntry(stat.st_size, stat.st_mtime_ns,
+                                           kind, status, info, asset_stats)
+        self._dirty = True
+
+    def remove(self, path):
+        if self.entries.pop(path, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """ Write the manifest file, if it changed
+        """
+        if self.path is None or not self._dirty:
+            return
+
+        data = {'version': self.version,
+                'entries': {k: v.to_json() for k, v in self.entries.items()}}
+        temp = self.path + '.tmp'
+        with open(temp, 'w') as fp:
+            json.dump(data, fp)
+        os.replace(temp, self.path)
+        self._dirty = False
+        logger.debug('saved %d entries', len(self.entries))
@@ -15,77 +15,185 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
-from __future__ import print_function
-
-import os
-import time
-import subprocess
-from os.path import join, normpath, relpath
+import asyncio
+from os.path import basename, normpath, relpath
 
 from libmugen import match_timeout
-from libmugen.win32 import list_windows, user32
+
+# window handling is only possible on windows; under wine, the game is
+# considered ready as soon as it starts
+try:
+    from libmugen.win32 import find_window, user32, wait_for_input_idle
+except (AttributeError, OSError):
+    user32 = None
+
+# most players a side, and the team mode that allows them, for each
+# executable.  these follow the command line documented by MUGEN 1.0 and
+# 1.1 (-p1 to -p8, and -tmode1/-tmode2 of single, simul or turns, with up
+# to four players in turns); they were checked against the documentation
+# only.  no team options are known to work from the command line of
+# WinMUGEN or others, so they are given one player a side.
+teams = {
+    'mugen.exe': (4, 'turns'),
+}
+
+
+def team_mode(executable):
+    """ Return the most players a side and the team mode for an executable
+
+    :param executable: path or name of the executable
+    :return: (players, mode)
+    """
+    return teams.get(basename(executable).lower(), (1, 'single'))
+
+
+def max_team_size(executable):
+    """ Return how many players a team can have with an executable
+    """
+    return team_mode(executable)[0]
 
 
 class MatchProcess:
+    """ One game of MUGEN, run as a subprocess of the event loop
+
+    Nothing is polled: the exit of the game is reported by the event loop's
+    child watcher as soon as it happens, so many matches can be run at
+    once without a thread for each.
+    """
     match_timeout = match_timeout
     rounds = 1
     default_character = None
     default_stage = None
 
     def __init__(self, root, player1, player2, stage, player1_ai=True, player2_ai=True,
-                 executable='winmugen.exe'):
+                 executable='winmugen.exe', launcher=(), team1=(), team2=(), team_mode='turns'):
+        """
+
+        :param launcher: arguments to run the executable with, like ['wine']
+        :param team1: more players on the side of player1; see teams for
+                      the executables that take them
+        :param team2: more players on the side of player2
+        :param team_mode: 'simul' or 'turns', used by a side with a team
+        """
         self.root = root
         self.executable = executable
+        self.launcher = list(launcher)
         self.stage = stage
         self.player1 = player1
         self.player2 = player2
         self.player1_ai = '1' if player1_ai else '0'
         self.player2_ai = '1' if player2_ai else '0'
+        self.team1 = list(team1)
+        self.team2 = list(team2)
+        self.team_mode = team_mode
         self.process = None
         self.returncode = None
+        self.timed_out = False
+        self.started = None
+        self.duration = None
+
+    @property
+    def crashed(self):
+        """ True if the game exited with an error before match_timeout
+
+        A game killed for running too long has timed_out set instead; a
+        long match is not a sign that anything is broken.
+        """
+        return not self.timed_out and self.returncode not in (0, None)
 
     def fix_path(self, path):
         """ mugen expects character names to be relative to mugen folder
         """
         return normpath(relpath(path, self.root))
 
-    def start_process(self):
-        """ Start then run
+    async def run(self):
+        """ Start the game and wait for it to exit
+
+        :return: the return code
+        """
+        await self.start_process()
+        try:
+            await self.wait_until_ready()
+        except asyncio.CancelledError:
+            await self.stop()
+            raise
+        return await self.wait()
+
+    async def start_process(self):
+        """ Start the game in the mugen folder
 
         :return:
         """
-        args = self.generate_command_args()
-        args.insert(0, self.executable)
-        os.chdir(self.root)
-        self.process = subprocess.Popen(args)
+        args = self.launcher + [self.executable] + self.generate_command_args()
+        self.process = await asyncio.create_subprocess_exec(*args, cwd=self.root)
+        self.started = asyncio.get_event_loop().time()
+        self.deadline = self.started + self.match_timeout
         self.returncode = None
+        self.timed_out = False
+        self.duration = None
+
+    async def wait_until_ready(self):
+        """ Wait for the game window, then bring it to the front
 
-    def wait_until_ready(self):
-        while self.returncode is None:
-            self.returncode = self.process.poll()
+        The window is only looked for once the game is idle, since mugen
+        will not run in the background.
+        """
+        if user32 is None:
+            return
+
+        loop = asyncio.get_event_loop()
+        timeout = int(self.remaining() * 1000)
+        ready = await loop.run_in_executor(None, wait_for_input_idle, self.process.pid, timeout)
+        if not ready:
+            return
 
-            try:
-                pdict = {i.pid: i for i in list_windows()}
-                handle = pdict[self.process.pid].handle
-                user32.SetForegroundWindow(handle)
-                top = user32.GetForegroundWindow()
-                if handle == top:
-                    break
+        window = find_window(self.process.pid)
+        if window is not None:
+            user32.SetForegroundWindow(window.handle)
 
-            except KeyError:
-                pass
+    async def wait(self):
+        """ Wait for the game to exit, killing it match_timeout seconds
+        after it was started
 
-            time.sleep(.5)
+        Time spent waiting for the window counts, so the whole match takes
+        no longer than match_timeout.
 
-    def run_subprocess(self):
+        :return: the return code
+        """
+        try:
+            self.returncode = await asyncio.wait_for(self.process.wait(), self.remaining())
+        except asyncio.TimeoutError:
+            self.timed_out = True
+            self.kill()
+            self.returncode = await self.process.wait()
+        except asyncio.CancelledError:
+            await self.stop()
+            raise
+        self.duration = asyncio.get_event_loop().time() - self.started
+        return self.returncode
+
+    def remaining(self):
+        """ Return the seconds left before the match is timed out
         """
-        Best run this in a thread to avoid blocking everything
+        return max(0, self.deadline - asyncio.get_event_loop().time())
 
-        :return:
+    async def stop(self):
+        """ Kill the game and wait for it to exit
+
+        The wait is shielded, so the game has exited before a cancelled
+        match returns, and its files can be removed.
         """
-        while self.returncode is None:
-            self.returncode = self.process.poll()
-            time.sleep(.075)
+        self.kill()
+        try:
+            await asyncio.shield(self.process.wait())
+        except asyncio.CancelledError:
+            pass
+
+    def kill(self):
+        try:
+            self.process.kill()
+        except ProcessLookupError:
+            pass
 
     def generate_command_args(self):
         p1_path = self.fix_path(self.player1.path)
@@ -97,4 +205,16 @@ class MatchProcess:
                 '-p2.ai', self.player2_ai,
                 '-rounds', str(self.rounds),
                 '-stage', stage]
+
+        # odd player numbers are on the first team, even on the second
+        if self.team1:
+            args.extend(['-tmode1', self.team_mode])
+        if self.team2:
+            args.extend(['-tmode2', self.team_mode])
+        for number, player in enumerate(self.team1):
+            args.extend(['-p{}'.format(number * 2 + 3), self.fix_path(player.path),
+                         '-p{}.ai'.format(number * 2 + 3), self.player1_ai])
+        for number, player in enumerate(self.team2):
+            args.extend(['-p{}'.format(number * 2 + 4), self.fix_path(player.path),
+                         '-p{}.ai'.format(number * 2 + 4), self.player2_ai])
         return args
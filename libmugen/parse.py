@@ -15,7 +15,7 @@ class MugenParser(RawConfigParser):
                          strict=False)
 
         # allow case headers with extra space (it happens...)
-        self.SECTCRE = re.compile(r"\[ *(?P<header>[^]]+?) *\]")
+        self.SECTCRE = section_regex
 
     def _read(self, fp, fpname):
         """ MUGEN flavored configuration parsing
@@ -31,59 +31,44 @@ class MugenParser(RawConfigParser):
         than the first line of the value. Depending on the parser's mode, blank
         lines may be treated as parts of multiline values or ignored.
 
-        Configuration files may include comments, prefixed by specific
-        characters (`#' and `;' by default). Comments may appear on their own
-        in an otherwise empty line or may be entered in lines holding values or
-        section names.
+        Comments start with `;', `#' or `:', at the start of a line or after
+        whitespace, and run to the end of the line.  The whole file is split
+        into lines and comments in one pass; see `line_regex'.
         """
         elements_added = set()
         cursect = None                        # None, or a dictionary
         sectname = None
         optname = None
         indent_level = 0
+        strict = self._strict
+        empty_lines_in_values = self._empty_lines_in_values
+        sections = self._sections
+        optcre_match = self._optcre.match
+        sectcre_match = self.SECTCRE.match
+        optionxform = self.optionxform
 
-        # some people like to include credits before the first section header
-        # this will accommodate this, even if it is not ini file spec.
-        skip_header = True
+        text = fp.read() if hasattr(fp, 'read') else ''.join(fp)
+        end = len(text)
 
+        # some people like to include credits before the first section header
+        # these lines are skipped, even if it is not ini file spec.
         e = None                              # None, or an exception
-        for lineno, line in enumerate(fp, start=1):
-            comment_start = sys.maxsize
-
-            # strip inline comments
-            inline_prefixes = {p: -1 for p in self._inline_comment_prefixes}
-            while comment_start == sys.maxsize and inline_prefixes:
-                next_prefixes = {}
-                for prefix, index in inline_prefixes.items():
-                    index = line.find(prefix, index + 1)
-                    if index == -1:
-                        continue
-                    next_prefixes[prefix] = index
-                    if index == 0 or (index > 0 and line[index - 1].isspace()):
-                        comment_start = min(comment_start, index)
-                inline_prefixes = next_prefixes
-
-            # strip full line comments
-            for prefix in self._comment_prefixes:
-                if line.strip().startswith(prefix):
-                    comment_start = 0
-                    break
-
-            if comment_start == sys.maxsize:
-                comment_start = None
-
-            value = line[:comment_start].strip()
+        for lineno, match in enumerate(line_regex.finditer(text), start=1):
+            if match.start() == end:
+                break
+            indent, value, comment = match.groups()
+            value = value.rstrip()
 
             if not value:
-                if self._empty_lines_in_values:
+                if empty_lines_in_values:
 
                     # add empty line to the value, but only if there was no
                     # comment on the line
-                    if (comment_start is None and
-                                cursect is not None and
+                    if (comment is None and
+                            cursect is not None and
                             optname and
-                                cursect[optname] is not None):
-                        cursect[optname].append('') # newlines added at join
+                            cursect[optname] is not None):
+                        cursect[optname].append('')  # newlines added at join
                 else:
 
                     # empty line marks end of value
@@ -91,82 +76,152 @@ class MugenParser(RawConfigParser):
                 continue
 
             # continuation line?
-            first_nonspace = self.NONSPACECRE.search(line)
-            cur_indent_level = first_nonspace.start() if first_nonspace else 0
+            cur_indent_level = len(indent)
             if cursect is not None and optname and cur_indent_level > indent_level:
                 cursect[optname].append(value)
+                continue
 
             # a section header or option header?
-            else:
-                indent_level = cur_indent_level
-                # is it a section header?
-                mo = self.SECTCRE.match(value)
-                if mo:
-                    skip_header = False
-                    # LT: lower case section names
-                    sectname = mo.group('header').lower()
-                    if sectname in self._sections:
-                        if self._strict and sectname in elements_added:
-                            raise DuplicateSectionError(sectname, fpname,
-                                                        lineno)
-                        cursect = self._sections[sectname]
-                        elements_added.add(sectname)
-                    elif sectname == self.default_section:
-                        cursect = self._defaults
-                    else:
-                        cursect = self._dict()
-                        self._sections[sectname] = cursect
-                        self._proxies[sectname] = SectionProxy(self, sectname)
-                        elements_added.add(sectname)
-
-                    # So sections can't start with a continuation line
-                    optname = None
+            indent_level = cur_indent_level
+
+            # is it a section header?
+            mo = sectcre_match(value) if value[0] == '[' else None
+            if mo:
+                # LT: lower case section names
+                sectname = mo.group('header').lower()
+                if sectname in sections:
+                    if strict and sectname in elements_added:
+                        raise DuplicateSectionError(sectname, fpname, lineno)
+                    cursect = sections[sectname]
+                elif sectname == self.default_section:
+                    cursect = self._defaults
+                else:
+                    cursect = self._dict()
+                    sections[sectname] = cursect
+                    self._proxies[sectname] = SectionProxy(self, sectname)
+                if strict:
+                    elements_added.add(sectname)
 
-                # no section header in the file?
-                # just skip it
-                elif cursect is None:
-                    indent_level = sys.maxsize
+                # So sections can't start with a continuation line
+                optname = None
 
-                    if not skip_header:
-                        sectname = None
-                        optname = None
-                        cursect = None
-                        # raise MissingSectionHeaderError(fpname, lineno, line)
+            # no section header in the file?
+            # just skip it
+            elif cursect is None:
+                indent_level = sys.maxsize
 
-                # an option line?
-                else:
-                    mo = self._optcre.match(value)
-                    if mo:
-                        optname, vi, optval = mo.group('option', 'vi', 'value')
-                        if not optname:
-                            e = self._handle_error(e, fpname, lineno, line)
-                        optname = self.optionxform(optname.rstrip())
-                        if (self._strict and
-                                    (sectname, optname) in elements_added):
+            # an option line?
+            else:
+                mo = optcre_match(value)
+                if mo:
+                    optname, vi, optval = mo.group('option', 'vi', 'value')
+                    if not optname:
+                        e = self._handle_error(e, fpname, lineno, match.group())
+                    optname = optionxform(optname.rstrip())
+                    if strict:
+                        if (sectname, optname) in elements_added:
                             raise DuplicateOptionError(sectname, optname,
                                                        fpname, lineno)
                         elements_added.add((sectname, optname))
 
-                        # This check is fine because the OPTCRE cannot
-                        # match if it would set optval to None
-                        if optval is not None:
-                            optval = optval.strip()
-                            cursect[optname] = [optval]
-                        else:
-
-                            # valueless option handling
-                            cursect[optname] = None
+                    # This check is fine because the OPTCRE cannot
+                    # match if it would set optval to None
+                    if optval is not None:
+                        cursect[optname] = [optval.strip()]
                     else:
-                        # a non-fatal parsing error occurred. set up the
-                        # exception but keep going. the exception will be
-                        # raised at the end of the file and will contain a
-                        # list of all bogus lines
 
-                        # LT: allow bogus lines
-                        # e = self._handle_error(e, fpname, lineno, line)
-                        pass
+                        # valueless option handling
+                        cursect[optname] = None
+
+                # LT: allow bogus lines
+                # a non-fatal parsing error would be raised here, at the
+                # end of the file, but MUGEN just ignores these lines
 
         # if any parsing errors occurred, raise an exception
         if e:
             raise e
         self._join_multiline_values()
+
+
+# allow case headers with extra space (it happens...)
+section_regex = re.compile(r"\[ *(?P<header>[^]]+?) *\]")
+
+# one line of a config file: the indentation, the content, and a comment.
+# a comment starts with ; # or : at the start of the line or after whitespace
+# (so "key:value" is an option, but "key :value" is a comment).
+line_regex = re.compile(r'([^\S\n]*)([^;#:\n]*(?:(?<=\S)[;#:][^;#:\n]*)*)([;#:][^\n]*)?\n?')
+
+
+def iter_config(source):
+    """ Parse a config file lazily, yielding one event per option
+
+    Yields (section, key, value, lineno) for each option, in file order,
+    following the same rules as MugenParser.  Each section header also yields
+    an event with a key and value of None.  Sections with the same name, like
+    repeated `[State 200, 1]' headers, are not merged.  Multiline values are
+    joined, so an option is yielded once the line after it is read.
+
+    Lines before the first section, bogus lines and options without a name
+    are skipped.
+
+    :param source: contents of a config file, or an open text file
+    :type source: str or file
+    """
+    if isinstance(source, str):
+        end = len(source)
+        matches = (m for m in line_regex.finditer(source) if m.start() < end)
+    else:
+        matches = (line_regex.match(line) for line in source)
+
+    optcre_match = RawConfigParser.OPTCRE.match
+    sectname = None
+    optname = None
+    lines = None
+    option_lineno = 0
+    indent_level = 0
+
+    for lineno, match in enumerate(matches, start=1):
+        indent, value, comment = match.groups()
+        value = value.rstrip()
+
+        if not value:
+            # blank lines are kept inside multiline values
+            if comment is None and optname:
+                lines.append('')
+            continue
+
+        # continuation line?
+        cur_indent_level = len(indent)
+        if optname and cur_indent_level > indent_level:
+            lines.append(value)
+            continue
+
+        indent_level = cur_indent_level
+        mo = section_regex.match(value) if value[0] == '[' else None
+        if mo:
+            if optname:
+                yield sectname, optname, '\n'.join(lines).rstrip(), option_lineno
+                optname = None
+            sectname = mo.group('header').lower()
+            yield sectname, None, None, lineno
+
+        elif sectname is None:
+            indent_level = sys.maxsize
+
+        else:
+            # bogus lines do not end the value before them, so deeper
+            # lines after one are still added to it, like MugenParser
+            mo = optcre_match(value)
+            if mo:
+                if optname:
+                    yield sectname, optname, '\n'.join(lines).rstrip(), option_lineno
+                    optname = None
+                key, vi, optval = mo.group('option', 'vi', 'value')
+                key = key.rstrip().lower()
+                if key:
+                    optname = key
+                    lines = [optval.strip()]
+                    option_lineno = lineno
+
+    if optname:
+        yield sectname, optname, '\n'.join(lines).rstrip(), option_lineno
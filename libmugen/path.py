@@ -19,15 +19,13 @@ import asyncio
 import contextlib
 import os
 import re
+import shutil
 import tempfile
 from os import scandir
-from os.path import dirname, exists, normpath
+from os.path import basename, dirname, join, normpath
 from subprocess import call
 
-import chardet
-
-from libmugen.config import strip_comments
-from libmugen.parse import MugenParser
+from libmugen.encoding import detect_encoding
 
 filename_regex = re.compile(
     r'(\w*(\\|\/))*\w+?\.(cmd|cns|sff|air|snd|act|def|mp3|ogg)$', re.I)
@@ -42,15 +40,100 @@ def open_folder(path):
     call(['explorer', path])
 
 
-async def async_exists(path):
-    """
+class DirectoryIndex:
+    """ Case insensitive listings of folders, to find files without stat
+
+    Each folder is listed once, when a file in it is first looked for.
+    Listings are kept until `validate' finds the folder changed.
 
-    :param path:
-    :return:
+    Files are found by the same rules as libmugen.assets.AssetIndex: only
+    files are returned, and only real folders (not links) are entered.
     """
-    # print('check:', path)
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, exists, path)
+
+    def __init__(self):
+        # folder: (mtime, {lower case name: (name, is folder)}), or
+        # (None, None) if missing
+        self._listings = dict()
+
+    def __len__(self):
+        return len(self._listings)
+
+    def listing(self, folder):
+        """ Return the names in a folder, keyed by lower case name
+
+        :return: dict of (name, True if a folder), or None if the folder
+                 doesn't exist
+        """
+        try:
+            return self._listings[folder][1]
+        except KeyError:
+            pass
+
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+            with scandir(folder) as entries:
+                names = {entry.name.lower(): (entry.name, entry.is_dir(follow_symlinks=False))
+                         for entry in entries}
+        except OSError:
+            mtime, names = None, None
+        self._listings[folder] = mtime, names
+        return names
+
+    def _cached_listing(self, folder):
+        return self._listings[folder][1]
+
+    def resolve(self, folder, filename, listing=None):
+        """ Return the real path of a file, ignoring case, or None
+
+        :param folder: folder the filename is relative to
+        :param filename: name or relative path, with / or \\
+        """
+        listing = listing or self.listing
+        path = normpath(folder)
+        parts = [i for i in filename.replace('\\', '/').split('/') if i not in ('', '.')]
+        if not parts or parts[-1] == '..':
+            return None
+
+        last = len(parts) - 1
+        for i, part in enumerate(parts):
+            if part == '..':
+                path = dirname(path)
+                continue
+            names = listing(path)
+            if names is None:
+                return None
+            try:
+                name, is_folder = names[part.lower()]
+            except KeyError:
+                return None
+            # folders on the way, and a file at the end
+            if is_folder != (i < last):
+                return None
+            path = join(path, name)
+        return path
+
+    async def resolve_async(self, folder, filename):
+        """ Like resolve, but folders not listed yet are listed in the executor
+        """
+        try:
+            return self.resolve(folder, filename, self._cached_listing)
+        except KeyError:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, self.resolve, folder, filename)
+
+    def validate(self):
+        """ Forget the listings of folders that changed since being listed
+        """
+        for folder, (mtime, names) in list(self._listings.items()):
+            try:
+                current = os.stat(folder).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                del self._listings[folder]
+
+    def clear(self):
+        self._listings.clear()
 
 
 def scantree(path):
@@ -63,10 +146,7 @@ def scantree(path):
 
 
 def open_guess_encoding(filename):
-    with open(filename, 'rb') as fp:
-        guess = chardet.detect(fp.read())
-
-    return guess['encoding']
+    return detect_encoding(filename)
 
 
 def verify_name_matches_def(name, path):
@@ -75,57 +155,85 @@ def verify_name_matches_def(name, path):
     return name == assumed_name
 
 
-async def gather_required_files(context, path, config):
+def config_filenames(config):
+    """ Return every value of a config that looks like a filename, once
+
+    :type config: libmugen.parse.MugenParser
+    :rtype: set
+    """
+    filenames = set()
+    for name, section in config.items():
+        for value in section.values():
+            if value and filename_regex.match(value):
+                filenames.add(normpath(value))  # not sure why this is needed
+    return filenames
+
+
+async def gather_required_files(context, path, config, max_concurrent=16):
     """ Search a character.def and return all the files needed to use it
     This is useful to remove unused assets that are shipped with a character
 
-    This is a recursive function, and will search more def files if found
+    This is a recursive function, and will search more def files if found.
+    Each def is only searched once, and files are found concurrently.
 
     There will likely be some false positives, especially with stage defs,
     so check to make sure they exist before moving them, etc
 
     TODO: directory structure?
+
+    :param context: libmugen.context.MugenRoot
+    :param path: path of the def
+    :param config: parsed def
+    :param max_concurrent: maximum number of files being found at once
+    :raises FileNotFoundError: a file is missing
+    :return: set of paths, including nested defs but not the def itself
     """
+    # compare the def with what find returns, so it is not searched twice
+    path = await context.resolve(dirname(path), basename(path)) or path
+    semaphore = asyncio.Semaphore(max_concurrent)
+    searched = {path}
+    required = await _gather_required_files(context, path, config, semaphore, searched)
+    required.discard(path)
+    return required
+
+
+async def _gather_required_files(context, path, config, semaphore, searched):
+    root = dirname(path)
+
+    async def find(filename):
+        async with semaphore:
+            return await context.find_asset(root, filename)
+
     # go through each section and store any options that look like filenames
-    required = set()
+    filenames = config_filenames(config)
+    required = set(await asyncio.gather(*map(find, filenames)))
 
-    for name, section in config.items():
-        for value in section.values():
-            if filename_regex.match(value):
-                # submit
-                filename = normpath(value)  # not sure why this is needed
-                root = dirname(path)
-                await context.find_asset(root, filename)
+    # defs already searched elsewhere in the tree are skipped; their files
+    # are added by whoever searched them
+    children = list()
+    for filename in required:
+        if filename.lower().endswith('.def') and filename not in searched:
+            searched.add(filename)
+            children.append(_gather_child(context, filename, semaphore, searched))
 
-    # wait for all to be verified
+    for files in await asyncio.gather(*children):
+        required.update(files)
 
     return required
 
 
+async def _gather_child(context, path, semaphore, searched):
+    config = await context.configs.get_async(path)
+    return await _gather_required_files(context, path, config, semaphore, searched)
+
+
 @contextlib.contextmanager
 def temp_dir_context():
     root = tempfile.mkdtemp()
-    yield root
-    os.unlink(root)
-
-
-def get_config(path):
-    # open the file, while ignoring encoding errors (usually comments)
-    # errors="surrogateescape" is used to ignore unknown characters if the
-    # encoding is incorrectly guessed.  Shift-JIS seems to give many errors
-    encoding = 'ascii'
-    with open(path, encoding=encoding, errors='surrogateescape') as fp:
-        data = strip_comments(fp.read())
-
     try:
-        config = MugenParser()
-        config.read_string(data)
-    except:
-        print(path)
-        print(data)
-        raise
-
-    return config
+        yield root
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
 
 
 def is_path(text):
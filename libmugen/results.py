@@ -0,0 +1,320 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Database of character check results
+===================================
+
+Results of checking characters are kept in an SQLite database, so they
+outlive the process and can be compared between builds of MUGEN.
+
+A character is known by the path of its def and a content hash of the def
+and every file it needs; a build is known by the hash of the executable.
+A result is only used again if the character and the build are the same,
+so changing a sprite, or trying another version of MUGEN, checks the
+character again while everything else is skipped.
+
+Stored for each character and build: whether its files were all found
+(`verified'), and whether it works in a match (`compatible').  Every match
+run is stored too, with its duration and exit code, so crash counts and
+failure rates can be found later without running anything.  A match that
+tests several characters at once can't say which of them crashed it, so
+only matches testing one character are counted as its crashes.
+
+File hashes are remembered with the size and mtime of the file, and are
+only computed again when either of them change.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from os.path import abspath
+
+from libmugen.cache import hash_file
+
+logger = logging.getLogger('ResultsStore')
+
+schema = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    digest TEXT NOT NULL);
+
+CREATE TABLE IF NOT EXISTS builds (
+    build TEXT PRIMARY KEY,
+    executable TEXT,
+    first_seen REAL NOT NULL);
+
+CREATE TABLE IF NOT EXISTS checks (
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    build TEXT NOT NULL,
+    verified TEXT,
+    compatible INTEGER,
+    checked REAL NOT NULL,
+    PRIMARY KEY (path, digest, build));
+
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    build TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL,
+    returncode INTEGER,
+    timed_out INTEGER NOT NULL,
+    crashed INTEGER NOT NULL,
+    tested INTEGER NOT NULL);
+
+CREATE TABLE IF NOT EXISTS players (
+    match INTEGER NOT NULL REFERENCES matches (id),
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL);
+
+CREATE INDEX IF NOT EXISTS players_character ON players (path, digest);
+"""
+
+tables = 'files', 'builds', 'checks', 'matches', 'players'
+
+
+class ResultsStore:
+    """ Check results of characters, kept in an SQLite database
+
+    May be used from more than one thread, like an executor.
+    """
+    version = 2
+
+    def __init__(self, path=':memory:', executable=None):
+        """
+
+        :param path: database file; created if needed
+        :param executable: MUGEN executable the results are for; if None,
+                           results are stored for an unknown build
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._create()
+
+        self.build = ''
+        if executable is not None:
+            self.build = self.file_hash(executable)
+        with self._lock, self._db:
+            self._db.execute('INSERT OR IGNORE INTO builds VALUES (?, ?, ?)',
+                             (self.build, executable, time.time()))
+
+        self.compatibility = CompatibilityResults(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _create(self):
+        with self._lock, self._db:
+            version = self._db.execute('PRAGMA user_version').fetchone()[0]
+            if version not in (0, self.version):
+                logger.debug('dropping results of version %s', version)
+                for table in tables:
+                    self._db.execute('DROP TABLE IF EXISTS ' + table)
+            self._db.executescript(schema)
+            self._db.execute('PRAGMA user_version = {}'.format(self.version))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def file_hash(self, path):
+        """ Return the content hash of a file, computing it only if changed
+
+        :param path: path to the file
+        :return: str
+        """
+        path = abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._db.execute('SELECT size, mtime, digest FROM files WHERE path = ?',
+                                   (path,)).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+
+        digest = hash_file(path)
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                             (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def content_hash(self, path, assets=()):
+        """ Return the content hash of a def and the files it needs
+
+        Missing files are hashed as missing, so adding them changes the hash.
+
+        :param path: path to the def
+        :param assets: paths of the files the def needs
+        :return: str
+        """
+        digest = hashlib.sha1(self.file_hash(path).encode())
+        for asset in sorted(set(assets)):
+            try:
+                asset_hash = self.file_hash(asset)
+            except OSError:
+                asset_hash = 'missing'
+            digest.update('\0{}\0{}'.format(asset, asset_hash).encode())
+        return digest.hexdigest()
+
+    def key(self, path, assets=()):
+        """ Return the key of a character's results
+
+        :param path: path to the def
+        :param assets: paths of the files the def needs
+        :return: (path, content hash)
+        """
+        return path, self.content_hash(path, assets)
+
+    def _check(self, key, column, value):
+        path, digest = key
+        with self._lock, self._db:
+            self._db.execute('INSERT OR IGNORE INTO checks (path, digest, build, checked) '
+                             'VALUES (?, ?, ?, ?)', (path, digest, self.build, time.time()))
+            self._db.execute('UPDATE checks SET {} = ?, checked = ? '
+                             'WHERE path = ? AND digest = ? AND build = ?'.format(column),
+                             (value, time.time(), path, digest, self.build))
+
+    def _lookup(self, key, column):
+        path, digest = key
+        with self._lock:
+            row = self._db.execute('SELECT {} FROM checks '
+                                   'WHERE path = ? AND digest = ? AND build = ?'.format(column),
+                                   (path, digest, self.build)).fetchone()
+        return None if row is None else row[0]
+
+    def record_verification(self, path, assets, status):
+        """ Store whether all the files of a character were found
+
+        :param path: path to the def
+        :param assets: paths of the files the def needs
+        :param status: 'good' or 'broken'
+        :return: the key of the character
+        """
+        key = self.key(path, assets)
+        self._check(key, 'verified', status)
+        return key
+
+    def verification(self, key):
+        """ Return the stored status of a character, or None if not verified
+
+        :param key: see ResultsStore.key
+        """
+        return self._lookup(key, 'verified')
+
+    def record_match(self, match, players):
+        """ Store a finished match
+
+        :param match: libmugen.matchprocess.MatchProcess
+        :param players: keys of the characters tested in the match
+        :return: id of the match
+        """
+        players = set(players)
+        duration = getattr(match, 'duration', None)
+        started = time.time() - (duration or 0)
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                'INSERT INTO matches (build, started, duration, returncode, timed_out, crashed, tested) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (self.build, started, duration, match.returncode,
+                 bool(match.timed_out), bool(match.crashed), len(players)))
+            match_id = cursor.lastrowid
+            self._db.executemany('INSERT INTO players VALUES (?, ?, ?)',
+                                 [(match_id, path, digest) for path, digest in players])
+        return match_id
+
+    def crash_count(self, key, build=None):
+        """ Return how many matches testing only one character crashed
+
+        Matches testing more than one character are not counted, since
+        their crashes may be the fault of another character.
+
+        :param key: see ResultsStore.key
+        :param build: build to count; default is this one
+        :return: (crashes, matches)
+        """
+        path, digest = key
+        build = self.build if build is None else build
+        with self._lock:
+            row = self._db.execute(
+                'SELECT COALESCE(SUM(crashed), 0), COUNT(*) FROM matches '
+                'JOIN players ON players.match = matches.id '
+                'WHERE path = ? AND digest = ? AND build = ? AND tested = 1',
+                (path, digest, build)).fetchone()
+        return row
+
+    def failure_rates(self):
+        """ Return how many characters checked in each build are broken
+
+        A character is broken if its files are missing or it is not
+        compatible.
+
+        :return: list of (build, executable, checked, broken), oldest first
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT builds.build, executable, COUNT(path), '
+                "COALESCE(SUM(verified = 'broken' OR compatible = 0), 0) "
+                'FROM builds LEFT JOIN checks ON checks.build = builds.build '
+                'GROUP BY builds.build ORDER BY first_seen').fetchall()
+
+
+class CompatibilityResults(MutableMapping):
+    """ Mapping of character keys to True if they work in a match in the
+    current build, or False if not
+
+    Can be used as the results of libmugen.triage.CrashTriage.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, key):
+        value = self.store._lookup(key, 'compatible')
+        if value is None:
+            raise KeyError(key)
+        return bool(value)
+
+    def __setitem__(self, key, value):
+        self.store._check(key, 'compatible', bool(value))
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.store._check(key, 'compatible', None)
+
+    def __iter__(self):
+        store = self.store
+        with store._lock:
+            rows = store._db.execute('SELECT path, digest FROM checks '
+                                     'WHERE build = ? AND compatible IS NOT NULL',
+                                     (store.build,)).fetchall()
+        return iter(rows)
+
+    def __len__(self):
+        store = self.store
+        with store._lock:
+            return store._db.execute('SELECT COUNT(*) FROM checks '
+                                     'WHERE build = ? AND compatible IS NOT NULL',
+                                     (store.build,)).fetchone()[0]
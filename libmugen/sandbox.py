@@ -0,0 +1,265 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Isolated MUGEN folders for matches
+==================================
+
+Each match gets its own temporary MUGEN folder, holding only the
+characters and stage of the match, so matches can run side by side
+without seeing or changing each other's files.
+
+Nothing is copied if it can be avoided: files are hardlinked, or else
+symlinked, and only copied (as a reflink, where the file system can) when
+neither works.  Everything in the MUGEN folder other than chars and stages
+is linked in as is, except the files MUGEN writes to, like mugen.cfg, the
+logs and the save folder; those are copied into each sandbox, so matches
+never write to the originals or to each other's files.
+"""
+import copy
+import fnmatch
+import logging
+import os
+import shutil
+import tempfile
+from os.path import dirname, join, relpath
+
+from libmugen.matchprocess import MatchProcess
+from libmugen.path import gather_required_files
+
+logger = logging.getLogger('MatchSandbox')
+
+# linux ioctl to share the data of one file with another (copy on write)
+FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    """ Copy a file, sharing the data on disk if the file system can
+
+    Falls back to a normal copy.
+    """
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+    except (ImportError, OSError):
+        shutil.copy2(src, dst)
+
+
+def stage_file(src, dst):
+    """ Make a file available at another path, with as little copying as
+    possible; hardlink, symlink, then reflink or copy.
+
+    :return: how it was done; 'link', 'symlink' or 'copy'
+    """
+    if os.path.lexists(dst):
+        raise FileExistsError(dst)
+
+    try:
+        os.link(src, dst)
+        return 'link'
+    except OSError:
+        pass
+
+    try:
+        os.symlink(os.path.abspath(src), dst)
+        return 'symlink'
+    except OSError:
+        pass
+
+    reflink(src, dst)
+    return 'copy'
+
+
+def stage_tree(src, dst):
+    """ Make a folder available at another path; a symlink if possible,
+    otherwise every file is staged on its own
+    """
+    try:
+        os.symlink(os.path.abspath(src), dst, target_is_directory=True)
+        return
+    except OSError:
+        pass
+
+    os.makedirs(dst, exist_ok=True)
+    for entry in os.scandir(src):
+        target = join(dst, entry.name)
+        if entry.is_dir():
+            stage_tree(entry.path, target)
+        else:
+            stage_file(entry.path, target)
+
+
+class MatchSandbox:
+    """ A temporary MUGEN folder for one match
+
+    Use as a context manager; the folder is removed when done.
+    """
+    # folders only staged with the files needed for the match
+    private_folders = 'chars', 'stages'
+
+    # folders and files mugen writes to, copied into each sandbox; patterns
+    # are matched against the lower case, / separated path in the folder
+    writable_folders = 'save',
+    writable_patterns = '*.log', 'data/*.cfg', 'data/*.log'
+
+    def __init__(self, source, parent=None):
+        """
+
+        :param source: MUGEN folder to stage from
+        :param parent: folder to make the sandbox in; default is the system's
+        """
+        self.source = source
+        self.parent = parent
+        self.root = None
+        self._staged = set()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        """ Make the folder, and stage everything shared by all matches
+        """
+        self.root = tempfile.mkdtemp(prefix='mugen-', dir=self.parent)
+        self._stage_shared('')
+
+    def _stage_shared(self, local):
+        """ Stage a shared folder, copying the files mugen writes to
+
+        Folders holding writable files are staged file by file; others are
+        linked whole.
+
+        :param local: / separated folder relative to the MUGEN folder
+        """
+        for entry in os.scandir(join(self.source, local)):
+            name = entry.name if not local else local + '/' + entry.name
+            key = name.lower()
+            target = join(self.root, *name.split('/'))
+            if key in self.private_folders:
+                os.mkdir(target)
+            elif key in self.writable_folders:
+                shutil.copytree(entry.path, target, copy_function=reflink)
+            elif entry.is_dir():
+                if any(i.startswith(key + '/') for i in self.writable_patterns):
+                    os.mkdir(target)
+                    self._stage_shared(name)
+                else:
+                    stage_tree(entry.path, target)
+            elif self.is_writable(key):
+                reflink(entry.path, target)
+            else:
+                stage_file(entry.path, target)
+
+    def is_writable(self, key):
+        """ Check if mugen may write to a file
+
+        :param key: lower case, / separated path in the MUGEN folder
+        """
+        depth = key.count('/')
+        return any(fnmatch.fnmatchcase(key, i) and i.count('/') == depth
+                   for i in self.writable_patterns)
+
+    def close(self):
+        """ Remove the folder; the staged files are not touched
+        """
+        if self.root is None:
+            return
+
+        # symlinked folders are removed as links, not followed
+        shutil.rmtree(self.root, ignore_errors=True)
+        if os.path.exists(self.root):
+            logger.warning('could not remove %s', self.root)
+        self.root = None
+
+    def path(self, path):
+        """ Return where a file in the MUGEN folder is in the sandbox
+
+        :raises ValueError: the file is not in the MUGEN folder
+        """
+        local = relpath(path, self.source)
+        if local.startswith(os.pardir):
+            raise ValueError('{} is not in {}'.format(path, self.source))
+        return join(self.root, local)
+
+    def stage(self, path, tree=False):
+        """ Stage one file or folder from the MUGEN folder
+
+        :param tree: path is a folder
+        :return: path of the file in the sandbox
+        """
+        target = self.path(path)
+        parts = relpath(path, self.source).replace('\\', '/').split('/')
+        if parts[0].lower() not in self.private_folders:
+            # already in a folder shared with the MUGEN folder
+            return target
+
+        for i in range(1, len(parts) + 1):
+            if join(self.root, *parts[:i]) in self._staged:
+                return target
+
+        os.makedirs(dirname(target), exist_ok=True)
+        if tree:
+            stage_tree(path, target)
+        else:
+            stage_file(path, target)
+        self._staged.add(target)
+        return target
+
+    async def add(self, context, path):
+        """ Stage a def and all the files it needs
+
+        A def in its own folder, like chars/kfm/kfm.def, has the whole
+        folder staged, since some files it needs may not be found by
+        searching it.
+
+        :param context: libmugen.context.MugenRoot the def is in
+        :raises FileNotFoundError: a file needed by the def is missing
+        :return: path of the def in the sandbox
+        """
+        config = await context.configs.get_async(path)
+        required = await gather_required_files(context, path, config)
+
+        folder = dirname(path)
+        if len(relpath(folder, self.source).replace('\\', '/').split('/')) > 1:
+            self.stage(folder, tree=True)
+        for filename in required:
+            self.stage(filename)
+        return self.stage(path)
+
+    async def prepare(self, context, player1, player2, stage, team1=(), team2=(), **kwargs):
+        """ Stage two characters and a stage, and return a match in the sandbox
+
+        :param context: libmugen.context.MugenRoot of the players and stage
+        :param team1: more players on the side of player1
+        :param team2: more players on the side of player2
+        :param kwargs: passed to MatchProcess
+        :rtype: libmugen.matchprocess.MatchProcess
+        """
+        async def staged(item):
+            item = copy.copy(item)
+            item.path = await self.add(context, item.path)
+            return item
+
+        player1, player2, stage = [await staged(i) for i in (player1, player2, stage)]
+        team1 = [await staged(i) for i in team1]
+        team2 = [await staged(i) for i in team2]
+        return MatchProcess(self.root, player1, player2, stage,
+                            team1=team1, team2=team2, **kwargs)
@@ -0,0 +1,243 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Scheduling many matches at once
+===============================
+
+The scheduler runs queued jobs (usually matches) with a number of them at
+once that follows the load of the machine.  Every few seconds it checks
+the CPU load, memory use and how many recent jobs failed: if any is too
+high, half as many jobs are run; if all are low and jobs are waiting, one
+more is.  A machine that is too busy fails to start MUGEN, or lets jobs
+run past the scheduler's timeout, so those failures are counted as a
+sign of load too.  A match that crashes or times out on its own is a
+result, not a failure; it says something about the characters, not the
+machine.
+
+Jobs that raise an exception or run past the timeout are retried,
+waiting longer after each try.  psutil is used for CPU and memory use if
+installed.
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+
+from libmugen import match_timeout
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger('MatchScheduler')
+
+
+def cpu_load():
+    """ Return how busy the CPUs are, 1.0 being all busy, or None if unknown
+    """
+    if psutil is not None:
+        return psutil.cpu_percent() / 100
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def memory_load():
+    """ Return how much memory is used, 1.0 being all, or None if unknown
+    """
+    if psutil is not None:
+        return psutil.virtual_memory().percent / 100
+    try:
+        with open('/proc/meminfo') as fp:
+            info = dict(line.split(':', 1) for line in fp)
+        total = int(info['MemTotal'].split()[0])
+        available = int(info['MemAvailable'].split()[0])
+        return 1 - available / total
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        return None
+
+
+class MatchScheduler:
+    """ Queue of jobs run with a concurrency that adapts to the machine
+
+    A job is a coroutine function; whatever it returns is its result, and
+    is never retried.
+
+    Use as an async context manager, or call start and close.  Closing
+    waits for every queued job to finish.
+    """
+    # limits of the load, from 0 to 1, before running fewer jobs
+    max_cpu = .90
+    max_memory = .85
+    max_failure_rate = .5
+
+    # below these, more jobs may be run
+    low_cpu = .70
+    low_memory = .70
+
+    def __init__(self, max_workers=None, min_workers=1, retries=2, backoff=2.0,
+                 timeout=None, interval=5.0):
+        """
+
+        :param max_workers: most jobs run at once; default is the cpu count
+        :param min_workers: fewest jobs run at once
+        :param retries: times a job is tried again after an error or timeout
+        :param backoff: seconds to wait before the first retry; doubled after
+        :param timeout: seconds before a job is cancelled; default is twice
+                        match_timeout, to leave time to start the game
+        :param interval: seconds between checks of the load
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_workers = min(min_workers, self.max_workers)
+        self.limit = max(self.min_workers, self.max_workers // 2)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = match_timeout * 2 if timeout is None else timeout
+        self.interval = interval
+
+        self.running = 0
+        self.outcomes = deque(maxlen=20)
+        self._queue = deque()
+        self._tasks = set()
+        self._changed = None
+        self._dispatcher = None
+        self._monitor = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    @property
+    def pending(self):
+        return len(self._queue)
+
+    def start(self):
+        """ Start running jobs; must be called in the event loop, before
+        any job is submitted
+        """
+        self._changed = asyncio.Condition()
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+        self._monitor = asyncio.ensure_future(self._watch())
+
+    def submit(self, job, *args):
+        """ Queue a job
+
+        :param job: coroutine function
+        :param args: passed to job
+        :return: asyncio.Future of the result of the job
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._queue.append((job, args, future))
+        asyncio.ensure_future(self._notify())
+        return future
+
+    async def join(self):
+        """ Wait until every queued job is finished
+        """
+        async with self._changed:
+            await self._changed.wait_for(lambda: not self._queue and not self.running)
+
+    async def close(self):
+        """ Wait for all jobs to finish, then stop
+        """
+        await self.join()
+        for task in (self._dispatcher, self._monitor):
+            task.cancel()
+        await asyncio.gather(self._dispatcher, self._monitor, return_exceptions=True)
+
+    def adjust(self, cpu, memory):
+        """ Change the number of jobs run at once for the current load
+
+        :param cpu: see cpu_load; None if unknown
+        :param memory: see memory_load; None if unknown
+        :return: the new limit
+        """
+        failure_rate = 0
+        if len(self.outcomes) >= 5:
+            failure_rate = sum(self.outcomes) / len(self.outcomes)
+
+        if ((cpu is not None and cpu > self.max_cpu) or
+                (memory is not None and memory > self.max_memory) or
+                failure_rate > self.max_failure_rate):
+            limit = max(self.min_workers, self.limit // 2)
+            # don't punish the next few checks for the same failures
+            self.outcomes.clear()
+        elif ((cpu is None or cpu < self.low_cpu) and
+                (memory is None or memory < self.low_memory) and
+                self._queue and self.running >= self.limit):
+            limit = min(self.max_workers, self.limit + 1)
+        else:
+            limit = self.limit
+
+        if limit != self.limit:
+            logger.debug('running %d jobs at once; cpu %s, memory %s, failures %.2f',
+                         limit, cpu, memory, failure_rate)
+            self.limit = limit
+        return limit
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.adjust(cpu_load(), memory_load())
+            await self._notify()
+
+    async def _dispatch(self):
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._queue and self.running < self.limit)
+                job, args, future = self._queue.popleft()
+                self.running += 1
+            task = asyncio.ensure_future(self._run(job, args, future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job, args, future):
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                try:
+                    result = await asyncio.wait_for(job(*args), self.timeout)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # includes asyncio.TimeoutError
+                    logger.debug('job %s failed, try %d: %r', job, attempt + 1, e)
+                    self.outcomes.append(True)
+                    if attempt == self.retries:
+                        future.set_exception(e)
+                    continue
+
+                # a crashed or timed out match is a result like any other
+                self.outcomes.append(False)
+                future.set_result(result)
+                break
+        finally:
+            if not future.done():
+                future.cancel()
+            async with self._changed:
+                self.running -= 1
+                self._changed.notify_all()
@@ -31,8 +31,18 @@ discretion advised.  Not available in all areas.
 
 leif theden, 2012-2016
 """
+import mmap
+import re
+import struct
+from collections import namedtuple
+
 from construct import *
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class RunLengthAdapter(Adapter):
     def _encode(self, obj, context):
@@ -62,12 +72,14 @@ sff1_subfile_header = Struct(
     ULInt16('index'),
     ULInt8('palette'),
     Padding(13),
+    record=True,
 )
 
 sff1_subfile = Struct(
     'sff1_subfile',
     Embed(sff1_subfile_header),
     String('image_data', lambda ctx: ctx.length - 32),
+    record=True,
 )
 
 sff1_file = Struct(
@@ -127,12 +139,15 @@ sff2_sprite = Struct(
                         Switch("pixels", lambda ctx: ctx._.format,
                                {
                                    'invalid': Pass,
-                                   'rle8': Array(lambda ctx: ctx._.data_length - 4, ULInt8('byte'))
+                                   'rle8': Field('data', lambda ctx: ctx._.data_length - 4),
+                                   'rle5': Field('data', lambda ctx: ctx._.data_length - 4),
+                                   'lz5': Field('data', lambda ctx: ctx._.data_length - 4),
                                },
                                default=Pass
                                )
                     )
-                    )
+                    ),
+    record=True,
 )
 
 sff2_palette = Struct(
@@ -157,7 +172,8 @@ sff2_palette = Struct(
                               )
                               )
                         )
-    )
+    ),
+    record=True,
 )
 
 sff2_file = Struct(
@@ -197,5 +213,538 @@ sff2_file = Struct(
         'sprites',
         OnDemandPointer(lambda ctx: ctx.sprite_offset,
                         Array(lambda ctx: ctx.sprite_total, sff2_sprite)),
-    )
+    ),
 )
+
+
+# one byte strings for every color, used to build runs
+single_bytes = [bytes((i,)) for i in range(256)]
+
+# rle5 data bytes hold a 3 bit run length and a 5 bit color
+rle5_runs = [single_bytes[i & 0x1f] * ((i >> 5) + 1) for i in range(256)]
+
+# rle8 streams are made of single literal bytes, and two byte runs.  a run
+# starts with a byte in the 0x40-0x7f range and is followed by the color.
+# literals are matched greedily so each stretch of them is copied at once.
+rle8_token_regex = re.compile(b'[\x40-\x7f].|[^\x40-\x7f]+', re.S)
+
+
+def decode_rle8(data, size):
+    """ Decode SFF v2 rle8 pixel data into an indexed image
+
+    Runs and literal stretches are written into a preallocated buffer
+    with slice assignment, so there is no per-pixel python work.
+
+    :param data: compressed bytes, without the uncompressed size header
+    :param size: size of the decoded image in bytes; width * height
+    :rtype: bytearray
+    """
+    out = bytearray(size)
+    pos = 0
+    for chunk in rle8_token_regex.findall(data):
+        control = chunk[0]
+        if 0x3f < control < 0x80:
+            length = control & 0x3f
+            out[pos:pos + length] = chunk[1:] * length
+        else:
+            length = len(chunk)
+            out[pos:pos + length] = chunk
+        pos += length
+
+    # a malformed stream may overshoot; the image size is authoritative
+    del out[size:]
+    return out
+
+
+def decode_rle8_array(data, width, height):
+    """ Decode SFF v2 rle8 pixel data into a numpy array
+
+    The whole stream is expanded with vectorized operations.  A stretch of
+    bytes in the 0x40-0x7f range always starts on a token boundary, so
+    the run controls are the bytes at even offsets within each stretch.
+
+    Requires numpy.
+
+    :param data: compressed bytes, without the uncompressed size header
+    :param width: width of the sprite
+    :param height: height of the sprite
+    :return: contiguous uint8 array shaped (height, width)
+    """
+    if numpy is None:
+        raise RuntimeError('numpy is required to decode into arrays')
+
+    size = width * height
+    src = numpy.frombuffer(data, dtype=numpy.uint8)
+    if not len(src):
+        return numpy.zeros((height, width), dtype=numpy.uint8)
+
+    index = numpy.arange(len(src))
+    in_range = (src & 0xc0) == 0x40
+    starts = in_range.copy()
+    starts[1:] &= ~in_range[:-1]
+    stretch_start = numpy.maximum.accumulate(numpy.where(starts, index, 0))
+    control = in_range & ((index - stretch_start) % 2 == 0)
+
+    color = numpy.zeros_like(control)
+    color[1:] = control[:-1]
+    tokens = numpy.flatnonzero(~color)
+
+    # a run control with no color byte after it is dropped
+    if control[-1]:
+        tokens = tokens[:-1]
+
+    is_run = control[tokens]
+    values = src[tokens + is_run]
+    counts = numpy.where(is_run, src[tokens] & 0x3f, 1)
+    pixels = numpy.repeat(values, counts)[:size]
+
+    if len(pixels) < size:
+        pixels = numpy.concatenate(
+            (pixels, numpy.zeros(size - len(pixels), dtype=numpy.uint8)))
+
+    return numpy.ascontiguousarray(pixels.reshape((height, width)))
+
+
+def decode_rle5(data, size):
+    """ Decode SFF v2 rle5 pixel data into an indexed image
+
+    Each packet is a run length, a data length with a color flag, an
+    optional 8 bit color, and then data length bytes of short 5 bit runs.
+
+    :param data: compressed bytes, without the uncompressed size header
+    :param size: size of the decoded image in bytes; width * height
+    :rtype: bytearray
+    """
+    out = bytearray(size)
+    pos = 0
+    i = 0
+    try:
+        while pos < size:
+            run = data[i] + 1
+            length = data[i + 1]
+            i += 2
+            if length & 0x80:
+                color = data[i]
+                i += 1
+                length &= 0x7f
+            else:
+                color = 0
+            out[pos:pos + run] = single_bytes[color] * run
+            pos += run
+
+            if length:
+                chunk = b''.join([rle5_runs[b] for b in data[i:i + length]])
+                out[pos:pos + len(chunk)] = chunk
+                pos += len(chunk)
+                i += length
+    except IndexError:
+        # truncated stream; the rest of the image is left blank
+        pass
+
+    del out[size:]
+    return out
+
+
+def decode_lz5(data, size):
+    """ Decode SFF v2 lz5 pixel data into an indexed image
+
+    Packets are grouped in eights behind a control byte; each control bit
+    selects a run of a 5 bit color, or a copy of previously decoded pixels.
+    Short copies store two bits of their offset in spare bits, which are
+    recycled as the whole offset of every fourth short copy.
+
+    :param data: compressed bytes, without the uncompressed size header
+    :param size: size of the decoded image in bytes; width * height
+    :rtype: bytearray
+    """
+    out = bytearray(size)
+    if not data:
+        return out
+
+    pos = 0
+    control = data[0]
+    i = 1
+    bit = 0
+    recycled = 0
+    recycled_bits = 0
+    try:
+        while pos < size:
+            d = data[i]
+            i += 1
+            if control & (1 << bit):
+                if d & 0x3f == 0:
+                    offset = ((d << 2) | data[i]) + 1
+                    length = data[i + 1] + 3
+                    i += 2
+                else:
+                    recycled |= (d & 0xc0) >> recycled_bits
+                    recycled_bits += 2
+                    length = (d & 0x3f) + 1
+                    if recycled_bits < 8:
+                        offset = data[i] + 1
+                        i += 1
+                    else:
+                        offset = recycled + 1
+                        recycled = 0
+                        recycled_bits = 0
+
+                start = pos - offset
+                if start < 0:
+                    raise ValueError('lz5 copy before start of image')
+
+                if offset >= length:
+                    out[pos:pos + length] = out[start:start + length]
+                else:
+                    # overlapping copy; repeat the pattern
+                    pattern = out[start:pos]
+                    repeat = length // offset + 1
+                    out[pos:pos + length] = (pattern * repeat)[:length]
+            else:
+                if d & 0xe0 == 0:
+                    length = data[i] + 8
+                    i += 1
+                else:
+                    length = d >> 5
+                    d &= 0x1f
+                out[pos:pos + length] = single_bytes[d] * length
+            pos += length
+
+            bit += 1
+            if bit == 8:
+                control = data[i]
+                i += 1
+                bit = 0
+    except IndexError:
+        # truncated stream; the rest of the image is left blank
+        pass
+
+    del out[size:]
+    return out
+
+
+decoders = {
+    'rle8': decode_rle8,
+    'rle5': decode_rle5,
+    'lz5': decode_lz5,
+}
+
+# pcx runs start with a byte that has both high bits set
+pcx_header_struct = struct.Struct('<4B4H')
+pcx_token_regex = re.compile(b'[\xc0-\xff].|[^\xc0-\xff]+', re.S)
+
+# used when a pcx image has no palette
+default_palette = [(i, i, i) for i in range(256)]
+
+
+def decode_pcx(data):
+    """ Decode an 8 bit pcx image, as stored in SFF v1 files
+
+    :param data: pcx file contents
+    :return: (width, height, pixels)
+    """
+    (manufacturer, version, encoding, bits,
+     xmin, ymin, xmax, ymax) = pcx_header_struct.unpack_from(data)
+    planes = data[65]
+    bytes_per_line = data[66] | data[67] << 8
+    if manufacturer != 0x0a or bits != 8 or planes != 1:
+        raise ValueError('only 8 bit, single plane pcx images are supported')
+
+    width = xmax - xmin + 1
+    height = ymax - ymin + 1
+    size = bytes_per_line * height
+    out = bytearray(size)
+    pos = 0
+    for chunk in pcx_token_regex.findall(data[128:]):
+        control = chunk[0]
+        if control > 0xbf:
+            length = control & 0x3f
+            out[pos:pos + length] = chunk[1:] * length
+        else:
+            length = len(chunk)
+            out[pos:pos + length] = chunk
+        pos += length
+        if pos >= size:
+            break
+
+    del out[size:]
+    if bytes_per_line != width:
+        out = bytearray().join(out[i:i + width] for i in range(0, size, bytes_per_line))
+
+    return width, height, out
+
+
+def pcx_palette(data):
+    """ Return the palette appended to a pcx image, or None
+
+    :param data: pcx file contents
+    :return: list of (red, green, blue) tuples
+    """
+    if len(data) < 897 or data[-769] != 0x0c:
+        return None
+    colors = bytes(data[-768:])
+    return [tuple(colors[i:i + 3]) for i in range(0, 768, 3)]
+
+
+# precompiled layouts of the SFF headers and tables.  these mirror the
+# construct definitions above, and are used to build the index quickly
+sff1_header_struct = struct.Struct('<12s4B4IB3x476x')
+sff1_subfile_struct = struct.Struct('<IIHHHHHB13x')
+sff2_header_struct = struct.Struct('<12s4B8x4B8x8I8x')
+sff2_sprite_struct = struct.Struct('<7HBBIIHH')
+sff2_palette_struct = struct.Struct('<4HII')
+
+sff2_formats = ('raw', 'invalid', 'rle8', 'rle5', 'lz5')
+
+SpriteHeader = namedtuple(
+    'SpriteHeader',
+    'groupno itemno width height axisx axisy index format colordepth '
+    'data_offset data_length palette_index flags')
+
+PaletteHeader = namedtuple(
+    'PaletteHeader',
+    'groupno itemno numcols index data_offset data_length')
+
+# offset and length are of the pcx data; for linked subfiles they are
+# taken from the subfile that is linked to, which is linked_index
+Subfile = namedtuple(
+    'Subfile',
+    'groupno imageno axisx axisy offset length linked_index shared_palette')
+
+# a sprite with its palette; the palette is a list of (red, green, blue)
+DecodedSprite = namedtuple(
+    'DecodedSprite',
+    'width height axisx axisy palette pixels')
+
+
+def index_sff1(buffer):
+    """ Walk the subfile chain of a SFF v1 file once
+
+    Linked subfiles are resolved to the data of the subfile they point
+    to, so their image can be read without following the chain again.
+
+    :param buffer: contents of the file; bytes, mmap, etc
+    :return: list of Subfile, in file order
+    """
+    header = sff1_header_struct.unpack_from(buffer)
+    next_subfile, header_length = header[7:9]
+    header_length = header_length or sff1_subfile_struct.size
+
+    unpack = sff1_subfile_struct.unpack_from
+    limit = len(buffer) - sff1_subfile_struct.size
+    subfiles = list()
+    while 0 < next_subfile <= limit:
+        offset = next_subfile
+        (next_subfile, length, axisx, axisy,
+         groupno, imageno, index, shared_palette) = unpack(buffer, offset)
+
+        linked_index = None
+        data_offset = offset + header_length
+        if not length and index < len(subfiles):
+            linked_index = index
+            linked = subfiles[index]
+            data_offset, length = linked.offset, linked.length
+
+        subfiles.append(Subfile(groupno, imageno, axisx, axisy, data_offset,
+                                length, linked_index, shared_palette))
+
+        # the chain only moves forward; anything else is a broken file
+        if next_subfile <= offset:
+            break
+
+    return subfiles
+
+
+class SFFFile:
+    """ Memory mapped SFF file with an index of its sprites
+
+    Only the sprite and palette tables are read when the file is opened.
+    Sprites are found by (group, item) in constant time, and pixel data
+    is decoded on request from slices of the map.
+
+    SFF v1 files are indexed by walking the subfile chain once; their
+    sprites are pcx images, which are returned as-is by sprite_data.
+
+    Slices returned by sprite_data are views of the map; they must be
+    released before the file is closed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sprites = dict()
+        self.sprite_list = list()
+        self.palette_list = list()
+        self._palettes = dict()
+
+        with open(path, 'rb') as fp:
+            self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+
+        if self._view[:12] != b'ElecbyteSpr\x00':
+            self.close()
+            raise ValueError('not a SFF file: {}'.format(path))
+
+        self.version = self._view[15]
+        if self.version == 2:
+            self._index_sff2()
+        elif self.version == 1:
+            self._index_sff1()
+        else:
+            self.close()
+            raise ValueError('unsupported SFF version: {}'.format(path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self.sprites
+
+    def __iter__(self):
+        return iter(self.sprites)
+
+    def __len__(self):
+        return len(self.sprite_list)
+
+    def close(self):
+        if self._map is not None:
+            self._view.release()
+            self._map.close()
+            self._map = None
+
+    def _index_sff1(self):
+        self.sprite_list = index_sff1(self._map)
+        self._palette_sources = dict()
+
+        # shared palette subfiles use the palette of the last one that
+        # had its own, which is looked up when the sprite is decoded
+        source = None
+        for subfile in self.sprite_list:
+            if source is None or not subfile.shared_palette:
+                source = subfile
+            key = subfile.groupno, subfile.imageno
+            self.sprites.setdefault(key, subfile)
+            self._palette_sources.setdefault(key, source)
+
+    def _index_sff2(self):
+        header = sff2_header_struct.unpack_from(self._map)
+        (sprite_offset, sprite_total, palette_offset, palette_total,
+         self.ldata_offset, ldata_length,
+         self.tdata_offset, tdata_length) = header[9:]
+
+        unpack = sff2_palette_struct.unpack_from
+        for i in range(palette_total):
+            offset = palette_offset + i * sff2_palette_struct.size
+            self.palette_list.append(PaletteHeader(*unpack(self._map, offset)))
+
+        unpack = sff2_sprite_struct.unpack_from
+        for i in range(sprite_total):
+            offset = sprite_offset + i * sff2_sprite_struct.size
+            sprite = SpriteHeader(*unpack(self._map, offset))
+            self.sprite_list.append(sprite)
+
+            # the first sprite with a number wins, like in mugen
+            self.sprites.setdefault((sprite.groupno, sprite.itemno), sprite)
+
+    def sprite_data(self, groupno, itemno):
+        """ Return the stored pixel data of a sprite, without copying
+
+        Linked sprites return the data of the sprite they link to.
+        Compressed data does not include the uncompressed size header.
+        For SFF v1, this is the pcx image.
+
+        :rtype: memoryview
+        """
+        sprite = self.sprites[(groupno, itemno)]
+        if self.version == 1:
+            return self._view[sprite.offset:sprite.offset + sprite.length]
+
+        if not sprite.data_length:
+            sprite = self.sprite_list[sprite.index]
+
+        base = self.tdata_offset if sprite.flags & 1 else self.ldata_offset
+        start = base + sprite.data_offset
+        if sprite.format:
+            start += 4
+        return self._view[start:base + sprite.data_offset + sprite.data_length]
+
+    def pixels(self, groupno, itemno):
+        """ Return the decoded, indexed image of a sprite
+
+        :rtype: bytearray
+        """
+        if self.version == 1:
+            data = self.sprite_data(groupno, itemno)
+            try:
+                return decode_pcx(data)[2]
+            finally:
+                data.release()
+
+        sprite = self.sprites[(groupno, itemno)]
+        if sprite.data_length:
+            format = sprite.format
+        else:
+            format = self.sprite_list[sprite.index].format
+
+        decode = None
+        if format:
+            try:
+                decode = decoders[sff2_formats[format]]
+            except (IndexError, KeyError):
+                raise ValueError('unsupported sprite format: {}'.format(format))
+
+        size = sprite.width * sprite.height
+        data = self.sprite_data(groupno, itemno)
+        try:
+            if decode is None:
+                return bytearray(data[:size])
+            return decode(data, size)
+        finally:
+            data.release()
+
+    def palette(self, index):
+        """ Return a palette as a list of (red, green, blue) tuples
+
+        :param index: position of the palette in the palette table
+        """
+        if self.version == 1:
+            raise ValueError('SFF v1 palettes are stored in the pcx images')
+
+        try:
+            return self._palettes[index]
+        except KeyError:
+            pass
+
+        header = self.palette_list[index]
+        if not header.data_length:
+            header = self.palette_list[header.index]
+
+        start = self.ldata_offset + header.data_offset
+        data = self._map[start:start + header.data_length]
+        colors = [tuple(data[i:i + 3]) for i in range(0, len(data), 4)]
+        self._palettes[index] = colors
+        return colors
+
+    def sprite(self, groupno, itemno):
+        """ Return a sprite, decoded and with its palette
+
+        :rtype: DecodedSprite
+        """
+        header = self.sprites[(groupno, itemno)]
+        if self.version == 2:
+            return DecodedSprite(header.width, header.height,
+                                 header.axisx, header.axisy,
+                                 self.palette(header.palette_index),
+                                 self.pixels(groupno, itemno))
+
+        data = self.sprite_data(groupno, itemno)
+        try:
+            width, height, pixels = decode_pcx(data)
+        finally:
+            data.release()
+
+        source = self._palette_sources[(groupno, itemno)]
+        palette = pcx_palette(self._map[source.offset:source.offset + source.length])
+        return DecodedSprite(width, height, header.axisx, header.axisy,
+                             palette or default_palette, pixels)
@@ -16,7 +16,6 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import shutil
-from genericpath import exists
 from os.path import basename
 
 from libmugen.config import get_config
@@ -53,19 +52,22 @@ def load_stage(path):
     return new_stage(config, path)
 
 
-def move_stage(stage, dest):
+async def move_stage(context, stage, dest):
     """ move a stage, and any files it references
     will return true if successful, false if it failed
 
     TODO: handle case when stage already exists
     TODO: handle properly moving assets with relative filename
-    """
-    files = gather_required_files(stage.path)
-    files.add(stage.path)
 
-    if all(exists(fn) for fn in files):
-        for fn in files:
-            shutil.move(fn, dest)
-        return True
+    :param context: libmugen.context.MugenRoot the stage is in
+    """
+    config = await context.configs.get_async(stage.path)
+    try:
+        files = await gather_required_files(context, stage.path, config)
+    except FileNotFoundError:
+        return False
 
-    return False
+    files.add(stage.path)
+    for fn in files:
+        shutil.move(fn, dest)
+    return True
@@ -0,0 +1,125 @@
+"""
+    MUGEN Toolkit for python
+    Copyright (C) 2012-2016  Leif Theden
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as
+    published by the Free Software Foundation, either version 3 of the
+    License, or (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Finding broken characters with few matches
+==========================================
+
+Most characters work, so a match is only spent on finding which ones
+don't.  Characters are tested in batches, as many as one match can hold
+(on both sides, as teams if the executable allows them): a batch that
+doesn't crash clears every character in it with one launch.  A batch that
+crashes is split in half and the first half tested; if it passes, the
+broken character must be in the second half, which is split again without
+being tested.  A single character that crashes is broken.  This assumes a
+batch only crashes if one of its characters is broken on its own.
+
+How much this saves depends on the batch size.  With 1% of characters
+broken, 1000 characters take about 170 launches in batches of 8 (four a
+side, MUGEN 1.x), and about 515 in batches of 2 (one a side), which is no
+better than testing them in pairs.
+
+Results are kept in a mapping from a key of each character (by default
+its def path and mtime) to True for working or False for broken, so a
+later run only tests characters that are new or changed.
+"""
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger('CrashTriage')
+
+
+def character_key(character):
+    """ Return the default cache key of a character; its path and mtime
+    """
+    return '{}:{}'.format(character.path, os.stat(character.path).st_mtime_ns)
+
+
+class CrashTriage:
+    """ Find broken characters by testing them in batches
+    """
+
+    def __init__(self, test, batch_size=2, results=None, key=character_key):
+        """
+
+        :param test: coroutine function taking a list of characters; returns
+                     True if a match with all of them didn't crash
+        :param batch_size: most characters tested in one match; 2 is one
+                           on each side
+        :param results: mapping of keys to True (good) or False (broken);
+                        may be persistent, like a shelve
+        :param key: function returning the key of a character
+        """
+        self.test = test
+        self.batch_size = batch_size
+        self.results = dict() if results is None else results
+        self.key = key
+        self.launches = 0
+
+    async def run(self, characters):
+        """ Test every character without a result, concurrently
+
+        :return: (list of good characters, list of broken characters)
+        """
+        characters = list(characters)
+        unknown = [i for i in characters if self.key(i) not in self.results]
+        logger.debug('%d characters, %d to test', len(characters), len(unknown))
+
+        size = self.batch_size
+        batches = [unknown[i:i + size] for i in range(0, len(unknown), size)]
+        await asyncio.gather(*map(self.check, batches))
+
+        good, broken = list(), list()
+        for character in characters:
+            (good if self.results[self.key(character)] else broken).append(character)
+        return good, broken
+
+    async def check(self, group):
+        """ Test characters of unknown state
+        """
+        if not group:
+            return
+        if not await self._test(group):
+            await self.split(group)
+
+    async def split(self, group):
+        """ Find the broken characters in a group known to crash
+        """
+        if len(group) == 1:
+            self._record(group, False)
+            return
+
+        half = len(group) // 2
+        first, second = group[:half], group[half:]
+        if await self._test(first):
+            # nothing wrong in the first half, so the second must crash
+            await self.split(second)
+        else:
+            await asyncio.gather(self.split(first), self.check(second))
+
+    async def _test(self, group):
+        self.launches += 1
+        passed = await self.test(group)
+        if passed:
+            self._record(group, True)
+        return passed
+
+    def _record(self, group, good):
+        for character in group:
+            self.results[self.key(character)] = good
+            if not good:
+                logger.info('broken: %s', character.path)
@@ -12,9 +12,14 @@ def check_zero(result, func, args):
     return args
 
 
+kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
 psapi = ctypes.WinDLL('psapi', use_last_error=True)
 user32 = ctypes.WinDLL('user32', use_last_error=True)
 
+INFINITE = 0xFFFFFFFF
+SYNCHRONIZE = 0x00100000
+PROCESS_QUERY_INFORMATION = 0x0400
+
 WindowInfo = namedtuple('WindowInfo', 'title pid handle')
 
 WNDENUMPROC = ctypes.WINFUNCTYPE(
@@ -51,6 +56,20 @@ user32.GetWindowTextW.argtypes = (
     wintypes.LPWSTR, # _Out_ lpString
     ctypes.c_int,)   # _In_  nMaxCount
 
+user32.WaitForInputIdle.restype = wintypes.DWORD
+user32.WaitForInputIdle.argtypes = (
+    wintypes.HANDLE, # _In_ hProcess
+    wintypes.DWORD,) # _In_ dwMilliseconds
+
+kernel32.OpenProcess.restype = wintypes.HANDLE
+kernel32.OpenProcess.argtypes = (
+    wintypes.DWORD, # _In_ dwDesiredAccess
+    wintypes.BOOL, # _In_ bInheritHandle
+    wintypes.DWORD,) # _In_ dwProcessId
+
+kernel32.CloseHandle.argtypes = (
+    wintypes.HANDLE,) # _In_ hObject
+
 psapi.EnumProcesses.errcheck = check_zero
 psapi.EnumProcesses.argtypes = (
     wintypes.LPDWORD, # _Out_ pProcessIds
@@ -79,3 +98,30 @@ def list_windows():
 
     user32.EnumWindows(enum_proc, 0)
     return sorted(result)
+
+
+def find_window(pid):
+    """ Return the first visible window of a process, or None
+
+    :rtype: WindowInfo
+    """
+    for window in list_windows():
+        if window.pid == pid:
+            return window
+
+
+def wait_for_input_idle(pid, timeout=INFINITE):
+    """ Block until a process is waiting for user input, with no input
+    pending; for a game, when its window is up.
+
+    :param pid: process id
+    :param timeout: milliseconds to wait
+    :return: True if the process is ready, False if the wait timed out
+    """
+    handle = kernel32.OpenProcess(SYNCHRONIZE | PROCESS_QUERY_INFORMATION, False, pid)
+    if not handle:
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        return user32.WaitForInputIdle(handle, timeout) == 0
+    finally:
+        kernel32.CloseHandle(handle)
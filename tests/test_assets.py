@@ -0,0 +1,142 @@
+"""
+Tests for libmugen.assets
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import asyncio
+import os
+import posixpath
+import shutil
+import tempfile
+from unittest import TestCase
+
+from libmugen.assets import AssetIndex
+from libmugen.context import MugenRoot
+from libmugen.path import gather_required_files
+from libmugen.stage import Stage, move_stage
+
+
+class AssetIndexTest(TestCase):
+    files = ('chars/KFM/KFM.def', 'chars/KFM/Sprites/kfm.SFF', 'chars/kfm2/kfm2.def',
+             'data/Common.snd', 'stages/kfm.def')
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for filename in self.files:
+            self.touch(filename)
+        self.index = AssetIndex(self.root)
+        self.index.refresh()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def touch(self, filename):
+        path = os.path.join(self.root, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+
+    def real(self, filename):
+        return os.path.join(self.root, *filename.split('/'))
+
+    def test_get(self):
+        self.assertEqual(self.index.get('chars\\kfm\\sprites\\KFM.sff'),
+                         self.real('chars/KFM/Sprites/kfm.SFF'))
+        self.assertEqual(self.index.get('chars/kfm/../../data/common.snd'),
+                         self.real('data/Common.snd'))
+        self.assertIsNone(self.index.get('chars/kfm/kfm.sff'))
+        self.assertIn('STAGES/KFM.DEF', self.index)
+
+    def test_find_name(self):
+        self.assertEqual(sorted(self.index.find_name('KFM.def')),
+                         [self.real('chars/KFM/KFM.def'), self.real('stages/kfm.def')])
+
+    def test_prefix(self):
+        self.assertEqual(self.index.prefix('chars/kfm2'), [self.real('chars/kfm2/kfm2.def')])
+        self.assertEqual(len(self.index.prefix('chars/k')), 3)
+
+    def test_in_folder(self):
+        self.assertEqual(self.index.in_folder('Chars/KFM'), [self.real('chars/KFM/KFM.def')])
+        self.assertEqual(len(self.index.in_folder('chars/kfm', recursive=True)), 2)
+        self.assertEqual(len(self.index.in_folder('', recursive=True)), len(self.files))
+
+    def test_refresh_async(self):
+        async def walk(index):
+            return sorted([item async for item in index.refresh_async(2)])
+
+        index = AssetIndex(self.root)
+        self.assertEqual(asyncio.run(walk(index)),
+                         sorted((posixpath.dirname(i), posixpath.basename(i)) for i in self.files))
+        self.assertEqual(index.get('stages/kfm.def'), self.real('stages/kfm.def'))
+
+        # unchanged folders are not listed again, but their files are yielded
+        self.assertEqual(len(asyncio.run(walk(index))), len(self.files))
+
+    def test_refresh(self):
+        self.touch('data/fight.def')
+        os.utime(self.real('data'), ns=(1, 1))
+        os.unlink(self.real('stages/kfm.def'))
+        os.utime(self.real('stages'), ns=(1, 1))
+        self.index.refresh()
+        self.assertIn('data/fight.def', self.index)
+        self.assertNotIn('stages/kfm.def', self.index)
+
+    def test_find_asset(self):
+        context = MugenRoot(self.root)
+        context.assets = self.index
+        folder = self.real('chars/KFM')
+        find = lambda filename: asyncio.run(context.find_asset(folder, filename))
+        self.assertEqual(find('sprites/KFM.sff'), self.real('chars/KFM/Sprites/kfm.SFF'))
+        self.assertEqual(find('common.snd'), self.real('data/Common.snd'))
+        self.assertEqual(find('chars/kfm2/kfm2.def'), self.real('chars/kfm2/kfm2.def'))
+        self.assertRaises(FileNotFoundError, find, 'missing.sff')
+
+
+class GatherRequiredFilesTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.write('stages/kfm.def', '[Info]\nname = "kfm"\n[BGdef]\nspr = kfm.sff\n'
+                                     '[Music]\nbgmusic = sound/kfm.mp3\nintro = intro.def\n')
+        self.write('stages/intro.def', '[Info]\nspr = kfm.sff\nsnd = intro.snd\nloop = kfm.def\n')
+        for filename in ('stages/kfm.sff', 'stages/intro.snd', 'sound/kfm.mp3'):
+            self.write(filename, '')
+        self.context = MugenRoot(self.root)
+        self.context.assets.refresh()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, filename, text):
+        path = os.path.join(self.root, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as fp:
+            fp.write(text)
+
+    def gather(self, filename):
+        path = os.path.join(self.root, filename)
+        config = self.context.configs.get(path)
+        return asyncio.run(gather_required_files(self.context, path, config))
+
+    def test_nested(self):
+        files = self.gather('stages/kfm.def')
+        self.assertEqual(sorted(os.path.relpath(i, self.root) for i in files),
+                         ['sound/kfm.mp3', 'stages/intro.def', 'stages/intro.snd', 'stages/kfm.sff'])
+
+    def test_unnormalized_path(self):
+        files = self.gather(os.path.join('sound', os.pardir, 'stages', 'kfm.def'))
+        self.assertNotIn(os.path.join(self.root, 'stages', 'kfm.def'), files)
+        self.assertEqual(len(files), 4)
+
+    def test_missing(self):
+        os.unlink(os.path.join(self.root, 'stages', 'intro.snd'))
+        self.context.assets.refresh()
+        self.assertRaises(FileNotFoundError, self.gather, 'stages/kfm.def')
+
+    def test_move_stage(self):
+        dest = os.path.join(self.root, 'moved')
+        os.mkdir(dest)
+        stage = Stage('kfm', 'kfm', os.path.join(self.root, 'stages', 'kfm.def'))
+        self.assertTrue(asyncio.run(move_stage(self.context, stage, dest)))
+        self.assertEqual(sorted(os.listdir(dest)),
+                         ['intro.def', 'intro.snd', 'kfm.def', 'kfm.mp3', 'kfm.sff'])
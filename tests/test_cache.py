@@ -0,0 +1,70 @@
+"""
+Tests for libmugen.cache
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from libmugen.cache import SpriteCache
+from libmugen.sff import DecodedSprite
+
+
+class SpriteCacheTest(TestCase):
+    sprite = DecodedSprite(2, 1, 0, 0, [(0, 0, 0), (255, 0, 0)], b'\x00\x01')
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.sff_path = os.path.join(self.root, 'fake.sff')
+        with open(self.sff_path, 'wb') as fp:
+            fp.write(b'not really a sff')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_get_missing(self):
+        cache = SpriteCache(os.path.join(self.root, 'cache'))
+        self.assertIsNone(cache.get(self.sff_path, 0, 0))
+
+    def test_put_get(self):
+        with SpriteCache(os.path.join(self.root, 'cache')) as cache:
+            cache.put(self.sff_path, 9000, 0, self.sprite)
+
+        # a new instance reads the saved hashes
+        cache = SpriteCache(os.path.join(self.root, 'cache'))
+        sprite = cache.get(self.sff_path, 9000, 0)
+        self.assertEqual(sprite.pixels, self.sprite.pixels)
+        self.assertEqual(sprite.palette[:2], self.sprite.palette)
+
+    def test_changed_file_misses(self):
+        cache = SpriteCache(os.path.join(self.root, 'cache'))
+        cache.put(self.sff_path, 9000, 0, self.sprite)
+        with open(self.sff_path, 'ab') as fp:
+            fp.write(b'!')
+        self.assertIsNone(cache.get(self.sff_path, 9000, 0))
+
+    def test_trim(self):
+        cache = SpriteCache(os.path.join(self.root, 'cache'), max_size=1000)
+        cache.put(self.sff_path, 9000, 0, self.sprite)
+        cache.put(self.sff_path, 9000, 1, self.sprite)
+        self.assertIsNone(cache.get(self.sff_path, 9000, 0))
+        self.assertIsNotNone(cache.get(self.sff_path, 9000, 1))
+
+    def test_concurrent_put(self):
+        # writers of the same entry each use their own temporary file
+        caches = [SpriteCache(os.path.join(self.root, 'cache')) for i in range(8)]
+        threads = [threading.Thread(target=cache.put, args=(self.sff_path, 9000, 0, self.sprite))
+                   for cache in caches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(caches[0].get(self.sff_path, 9000, 0).pixels, self.sprite.pixels)
+        names = os.listdir(os.path.join(self.root, 'cache'))
+        self.assertFalse([name for name in names if name.endswith('.tmp')])
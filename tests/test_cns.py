@@ -0,0 +1,72 @@
+"""
+Tests for libmugen.cns
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+from unittest import TestCase
+
+from libmugen.cns import CNS, Controller
+
+text = """\
+[Data]
+life = 1000
+
+[Statedef 200]
+type = S
+anim = 200
+
+[State 200, 1]
+type = HitDef
+trigger1 = AnimElem = 3
+trigger1 = Time > 0
+damage = 23
+
+[State 200, 1]
+type = PlaySnd
+trigger1 = Time = 1
+
+[State 200, end]
+type = hitdef
+trigger1 = Time = 10
+
+[Statedef 210]
+type = C
+
+[State 210, 1]
+type = ChangeState
+trigger1 = AnimTime = 0
+"""
+
+
+class CNSTest(TestCase):
+    def setUp(self):
+        self.cns = CNS()
+        self.cns.read(text)
+
+    def test_order(self):
+        self.assertEqual([s.number for s in self.cns.statedefs], [200, 210])
+        statedef = self.cns.statedef(200)
+        self.assertEqual([c.type for c in statedef.controllers], ['HitDef', 'PlaySnd', 'hitdef'])
+        self.assertEqual([c.label for c in statedef.controllers], ['1', '1', 'end'])
+
+    def test_of_type(self):
+        hitdefs = self.cns.controllers(200, 'HitDef')
+        self.assertEqual([c.lineno for c in hitdefs], [8, 18])
+        self.assertEqual(self.cns.controllers(210, 'HitDef'), [])
+        self.assertEqual(self.cns.controllers(999, 'HitDef'), [])
+
+    def test_duplicate_keys(self):
+        controller = self.cns.statedef(200).controllers[0]
+        self.assertIsInstance(controller, Controller)
+        self.assertEqual(controller.get_all('trigger1'), ['AnimElem = 3', 'Time > 0'])
+        self.assertEqual(controller.get('damage'), '23')
+
+    def test_sections(self):
+        self.assertEqual([s.name for s in self.cns.sections], ['data'])
+        self.assertEqual(self.cns.sections[0].get('life'), '1000')
+        self.assertEqual(self.cns.statedef(200).get('anim'), '200')
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.cns.statedef(200), '__dict__'))
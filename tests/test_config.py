@@ -0,0 +1,72 @@
+"""
+Tests for libmugen.config
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import os
+import pickle
+import shutil
+import tempfile
+from unittest import TestCase
+
+from libmugen.config import ConfigCache, PersistentConfigCache
+
+
+class ConfigCacheTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.paths = [os.path.join(self.root, 'char{}.def'.format(i)) for i in range(3)]
+        for path in self.paths:
+            self.write(path, 'kfm', 10 ** 9)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, path, name, mtime):
+        with open(path, 'w') as fp:
+            fp.write('[Info]\nname = "{}"\n'.format(name))
+        os.utime(path, ns=(mtime, mtime))
+
+    def test_cached(self):
+        cache = ConfigCache()
+        config = cache.get(self.paths[0])
+        self.assertIs(cache.get(self.paths[0]), config)
+        self.assertEqual(config['info']['name'], '"kfm"')
+
+    def test_changed(self):
+        cache = ConfigCache()
+        config = cache.get(self.paths[0])
+        self.write(self.paths[0], 'kfm2', 10 ** 9)
+        other = cache.get(self.paths[0])
+        self.assertIsNot(other, config)
+        self.assertEqual(other['info']['name'], '"kfm2"')
+
+    def test_evict(self):
+        cache = ConfigCache(max_size=2)
+        first = cache.get(self.paths[0])
+        cache.get(self.paths[1])
+        cache.get(self.paths[0])
+        cache.get(self.paths[2])
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get(self.paths[0]), first)
+
+    def test_pickle(self):
+        cache = ConfigCache()
+        cache.get(self.paths[0])
+        self.assertEqual(len(pickle.loads(pickle.dumps(cache))), 0)
+
+    def test_persistent(self):
+        with PersistentConfigCache(self.root) as cache:
+            cache.get(self.paths[0])
+
+        # the file would be parsed again if it was not read from the cache
+        cache = PersistentConfigCache(self.root)
+        with open(self.paths[0], 'w') as fp:
+            fp.write('[Info]\nname = "kfx"\n')
+        os.utime(self.paths[0], ns=(10 ** 9, 10 ** 9))
+        self.assertEqual(cache.get(self.paths[0])['info']['name'], '"kfm"')
+
+        os.utime(self.paths[0], ns=(2 * 10 ** 9, 2 * 10 ** 9))
+        self.assertEqual(cache.get(self.paths[0])['info']['name'], '"kfx"')
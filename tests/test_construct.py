@@ -0,0 +1,141 @@
+"""
+Tests for the construct fast paths
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import pickle
+from unittest import TestCase
+
+from construct import *
+
+header = Struct(
+    'header',
+    ULInt16('groupno'),
+    ULInt16('itemno'),
+    Enum(ULInt8('format'), raw=0, rle8=2),
+    String('name', 4),
+    Padding(2),
+    UBInt16('big'),
+)
+
+
+class StaticStructTest(TestCase):
+    data = b'\x01\x00\x02\x00\x02abcd\x00\x00\x01\x02'
+
+    def test_parse(self):
+        obj = header.parse(self.data)
+        self.assertEqual(list(obj.keys()), ['groupno', 'itemno', 'format', 'name', 'big'])
+        self.assertEqual((obj.groupno, obj.itemno, obj.format, obj.name, obj.big),
+                         (1, 2, 'rle8', b'abcd', 0x102))
+
+    def test_context(self):
+        struct = Struct('s', ULInt8('a'), ULInt8('b'), Value('c', lambda ctx: ctx.a + ctx.b))
+        self.assertEqual(struct.parse(b'\x01\x02').c, 3)
+
+    def test_embedded(self):
+        struct = Struct('s', ULInt8('a'), Embed(Struct('inner', ULInt8('b'), ULInt8('c'))))
+        self.assertEqual(struct.parse(b'\x01\x02\x03'), Container(a=1, b=2, c=3))
+
+    def test_short_read(self):
+        self.assertRaises(FieldError, header.parse, self.data[:-1])
+
+    def test_adapter_error(self):
+        self.assertRaises(MappingError, header.parse, b'\x00' * 4 + b'\x01' + self.data[5:])
+
+    def test_overwrite(self):
+        struct = Struct('s', ULInt8('a'), ULInt8('a'))
+        self.assertRaises(OverwriteError, struct.parse, b'\x01\x02')
+
+
+class BatchArrayTest(TestCase):
+    def test_bytes(self):
+        self.assertEqual(Array(3, ULInt8('v'), batch=True).parse(b'\x01\x02\x03'), b'\x01\x02\x03')
+
+    def test_numbers(self):
+        values = Array(2, UBInt16('v'), batch=True).parse(b'\x01\x02\x03\x04')
+        self.assertEqual(list(values), [0x102, 0x304])
+
+    def test_structs(self):
+        element = Struct('e', ULInt16('a'), Padding(1), Field('b', 2))
+        data = b'\x01\x00\xffab\x02\x00\xffcd'
+        records = Array(2, element, batch=True).parse(data)
+        self.assertIsInstance(records, RecordArray)
+        self.assertEqual(records, Array(2, element).parse(data))
+        self.assertEqual(list(records.column('a')), [1, 2])
+        self.assertEqual(records[1].b, b'cd')
+
+    def test_not_static(self):
+        element = Struct('e', ULInt8('n'), Field('data', lambda ctx: ctx.n))
+        self.assertEqual(Array(1, element, batch=True).parse(b'\x01a'), [Container(n=1, data=b'a')])
+
+    def test_short_read(self):
+        self.assertRaises(ArrayError, Array(3, ULInt16('v'), batch=True).parse, b'\x01\x02\x03')
+
+    def test_empty(self):
+        for count in (0, -1):
+            struct = Struct('s', Array(count, ULInt16('v'), batch=True), ULInt8('after'))
+            obj = struct.parse(b'\x07')
+            self.assertEqual(list(obj.v), [])
+            self.assertEqual(obj.after, 7)
+
+
+class RecordStructTest(TestCase):
+    record = Struct('record', ULInt8('a'), Padding(1), ULInt16('b'), record=True)
+
+    def test_parse(self):
+        obj = self.record.parse(b'\x01\x00\x02\x00')
+        self.assertIsInstance(obj, Record)
+        self.assertEqual((obj.a, obj['b']), (1, 2))
+        self.assertEqual(obj, Container(a=1, b=2))
+        self.assertEqual(obj.keys(), ['a', 'b'])
+
+    def test_slots(self):
+        obj = self.record.parse(b'\x01\x00\x02\x00')
+        self.assertFalse(hasattr(obj, '__dict__'))
+
+    def test_context(self):
+        struct = Struct('s', ULInt8('n'), Field('data', lambda ctx: ctx.n), record=True)
+        self.assertEqual(struct.parse(b'\x02ab').data, b'ab')
+
+    def test_build(self):
+        obj = self.record.parse(b'\x01\x00\x02\x00')
+        self.assertEqual(self.record.build(obj), b'\x01\x00\x02\x00')
+
+    def test_pickle(self):
+        obj = self.record.parse(b'\x01\x00\x02\x00')
+        copy = pickle.loads(pickle.dumps(obj))
+        self.assertIsInstance(copy, Record)
+        self.assertEqual(type(copy).__name__, 'record')
+        self.assertEqual(copy, obj)
+        self.assertEqual(copy.keys(), ['a', 'b'])
+
+    def test_invalid_name(self):
+        struct = Struct('s', ULInt8('palette type'), record=True)
+        self.assertIsInstance(struct.parse(b'\x01'), Container)
+
+    def test_method_name(self):
+        for name in ('keys', 'items', 'get', 'values'):
+            obj = Struct('s', ULInt8(name), record=True).parse(b'\x01')
+            self.assertNotIsInstance(obj, Record)
+            self.assertEqual(obj[name], 1)
+            repr(obj)
+
+
+class ProfilerTest(TestCase):
+    def test_paths(self):
+        struct = Struct('outer', ULInt8('n'), Struct('inner', Field('data', lambda ctx: ctx._.n)))
+        with Profiler() as profiler:
+            struct.parse(b'\x02ab')
+        rows = {row['path']: row for row in profiler.report()}
+        self.assertEqual(rows['outer.inner.data']['calls'], 1)
+        self.assertEqual(rows['outer.inner.data']['bytes'], 2)
+        self.assertEqual(rows['outer']['bytes'], 3)
+        self.assertIn('outer.inner.data', profiler.table())
+
+    def test_disabled(self):
+        parse = Struct._parse
+        with Profiler():
+            self.assertIsNot(Struct._parse, parse)
+        self.assertIs(Struct._parse, parse)
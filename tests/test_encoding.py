@@ -0,0 +1,56 @@
+"""
+Tests for libmugen.encoding
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from libmugen import encoding
+from libmugen.encoding import detect_encoding, guess_encoding, read_text
+
+
+class EncodingTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'kfm.def')
+        encoding.clear_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, data, mtime=None):
+        with open(self.path, 'wb') as fp:
+            fp.write(data)
+        if mtime is not None:
+            os.utime(self.path, ns=(mtime, mtime))
+
+    def test_guess(self):
+        self.assertEqual(guess_encoding(b'[Info]\nname = "kfm"\n'), 'ascii')
+        self.assertEqual(guess_encoding('name = "カンフーマン"'.encode('utf-8')), 'utf-8')
+        self.assertEqual(guess_encoding('name = "カンフーマン"'.encode('cp932')), 'cp932')
+        self.assertEqual(guess_encoding(b'\xef\xbb\xbf[Info]'), 'utf-8-sig')
+
+    def test_truncated(self):
+        data = 'name = "カンフーマン"'.encode('utf-8')
+        self.assertEqual(guess_encoding(data[:-2]), 'utf-8')
+
+    def test_read_text(self):
+        text = '[Info]\nname = "カンフーマン"\n'
+        self.write(text.encode('cp932'))
+        self.assertEqual(read_text(self.path), text)
+
+    def test_cached(self):
+        self.write('カンフーマン'.encode('utf-8'), 10 ** 9)
+        self.assertEqual(detect_encoding(self.path), 'utf-8')
+
+        # same size and mtime; not checked again
+        self.write('カンフーマン'.encode('cp932') + b' ' * 6, 10 ** 9)
+        self.assertEqual(detect_encoding(self.path), 'utf-8')
+
+        self.write('カンフーマン'.encode('cp932') + b' ' * 6, 2 * 10 ** 9)
+        self.assertEqual(detect_encoding(self.path), 'cp932')
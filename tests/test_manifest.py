@@ -0,0 +1,109 @@
+"""
+Tests for libmugen.manifest
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from libmugen.assets import AssetIndex
+from libmugen.config import ConfigCache
+from libmugen.context import MugenRoot
+from libmugen.manifest import Manifest
+
+
+class CountingCache(ConfigCache):
+    def __init__(self):
+        super().__init__()
+        self.loaded = list()
+
+    async def load_async(self, path, key, executor):
+        self.loaded.append(os.path.basename(path))
+        return await super().load_async(path, key, executor)
+
+
+class IncrementalScanTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.manifest_path = os.path.join(self.root, 'manifest.json')
+        self.add_character('kfm')
+        self.add_character('kfm2')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def add_character(self, name):
+        folder = os.path.join(self.root, 'chars', name)
+        os.makedirs(folder)
+        with open(os.path.join(folder, name + '.def'), 'w') as fp:
+            fp.write('[Info]\nname = "{0}"\n\n[Files]\nsprite = {0}.sff\n'.format(name))
+        with open(os.path.join(folder, name + '.sff'), 'wb') as fp:
+            fp.write(b'sff')
+
+    def scan(self):
+        configs = CountingCache()
+        context = MugenRoot(self.root, configs, Manifest(self.manifest_path))
+        asyncio.run(context.scan_root())
+        return context, sorted(configs.loaded)
+
+    def names(self, context):
+        return sorted(i.shortname for i in context.characters)
+
+    def test_unchanged(self):
+        context, loaded = self.scan()
+        self.assertEqual(loaded, ['kfm.def', 'kfm2.def'])
+        context, loaded = self.scan()
+        self.assertEqual(loaded, [])
+        self.assertEqual(self.names(context), ['kfm', 'kfm2'])
+
+    def test_added_and_removed(self):
+        self.scan()
+        self.add_character('kfm3')
+        shutil.rmtree(os.path.join(self.root, 'chars', 'kfm2'))
+        context, loaded = self.scan()
+        self.assertEqual(loaded, ['kfm3.def'])
+        self.assertEqual(self.names(context), ['kfm', 'kfm3'])
+
+    def test_asset_removed(self):
+        self.scan()
+        os.unlink(os.path.join(self.root, 'chars', 'kfm', 'kfm.sff'))
+        context, loaded = self.scan()
+        self.assertEqual(loaded, ['kfm.def'])
+        self.assertEqual(self.names(context), ['kfm2'])
+
+    def test_verified_after_walk(self):
+        # defs are parsed during the walk, but only verified once every
+        # file is in the asset index
+        sizes = list()
+
+        class Root(MugenRoot):
+            async def verify_character(self, character):
+                sizes.append(len(self.assets))
+                return await super().verify_character(character)
+
+        class SlowIndex(AssetIndex):
+            def _list(self, folder):
+                time.sleep(.02)
+                return super()._list(folder)
+
+        # the walk goes on well after the defs are found
+        os.makedirs(os.path.join(self.root, 'data', 'a', 'b', 'c', 'd', 'e'))
+        context = Root(self.root, ConfigCache(), Manifest())
+        context.assets = SlowIndex(self.root)
+        asyncio.run(context.scan_root())
+        self.assertEqual(sizes, [len(context.assets)] * 2)
+        self.assertEqual(self.names(context), ['kfm', 'kfm2'])
+
+    def test_version(self):
+        self.scan()
+        Manifest.version += 1
+        try:
+            self.assertEqual(len(Manifest(self.manifest_path)), 0)
+        finally:
+            Manifest.version -= 1
@@ -0,0 +1,100 @@
+"""
+Tests for libmugen.matchprocess
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import asyncio
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from os.path import join
+from unittest import TestCase
+
+from libmugen.matchprocess import MatchProcess, max_team_size, team_mode
+
+Player = namedtuple('Player', 'path')
+Stage = namedtuple('Stage', 'short_name')
+
+
+class MatchProcessTest(TestCase):
+    root = tempfile.gettempdir()
+
+    def match(self, code, timeout=5):
+        # the script gets the mugen arguments in sys.argv
+        player = Player(join(self.root, 'chars', 'kfm', 'kfm.def'))
+        match = MatchProcess(self.root, player, player, Stage('kfm'),
+                             launcher=[sys.executable, '-c', code])
+        match.match_timeout = timeout
+        return match
+
+    def test_args(self):
+        match = self.match('import sys; sys.exit(sys.argv[1:4] != ["winmugen.exe", "-p1", "chars/kfm/kfm.def"])')
+        self.assertEqual(asyncio.run(match.run()), 0)
+        self.assertFalse(match.crashed)
+
+    def test_team_args(self):
+        player = Player(join(self.root, 'chars', 'kfm', 'kfm.def'))
+        other = Player(join(self.root, 'chars', 'sf', 'sf.def'))
+        match = MatchProcess(self.root, player, player, Stage('kfm'), team1=[other, other])
+        args = match.generate_command_args()
+        self.assertEqual(args[args.index('-tmode1') + 1], 'turns')
+        self.assertEqual(args[args.index('-p3') + 1], join('chars', 'sf', 'sf.def'))
+        self.assertEqual(args[args.index('-p5.ai') + 1], '1')
+        self.assertNotIn('-p4', args)
+
+        # the second side has no team, so it keeps the default mode
+        self.assertNotIn('-tmode2', args)
+
+    def test_max_team_size(self):
+        self.assertEqual(team_mode(join('c:', 'mugen', 'MUGEN.exe')), (4, 'turns'))
+        self.assertEqual(max_team_size('winmugen.exe'), 1)
+
+    def test_crash(self):
+        match = self.match('import sys; sys.exit(3)')
+        self.assertEqual(asyncio.run(match.run()), 3)
+        self.assertTrue(match.crashed)
+        self.assertFalse(match.timed_out)
+
+    def test_timeout(self):
+        # a healthy match that is still running is killed, but didn't crash
+        match = self.match('import time; time.sleep(60)', timeout=.2)
+        start = time.perf_counter()
+        asyncio.run(match.run())
+        self.assertLess(time.perf_counter() - start, 10)
+        self.assertTrue(match.timed_out)
+        self.assertFalse(match.crashed)
+
+    def test_cancelled(self):
+        # a cancelled match has exited before it returns
+        async def cancel():
+            try:
+                await asyncio.wait_for(match.run(), .2)
+            except asyncio.TimeoutError:
+                return match.process.returncode
+
+        match = self.match('import time; time.sleep(60)', timeout=30)
+        self.assertIsNotNone(asyncio.run(cancel()))
+
+    def test_ready_counts(self):
+        # time waiting for the window is part of the match timeout
+        async def slow_start():
+            await asyncio.sleep(.3)
+
+        match = self.match('import time; time.sleep(60)', timeout=.5)
+        match.wait_until_ready = slow_start
+        start = time.perf_counter()
+        asyncio.run(match.run())
+        self.assertLess(time.perf_counter() - start, .75)
+        self.assertTrue(match.timed_out)
+
+    def test_concurrent(self):
+        async def run_all():
+            matches = [self.match('import time; time.sleep(.3)') for i in range(20)]
+            return await asyncio.gather(*(i.run() for i in matches))
+
+        start = time.perf_counter()
+        self.assertEqual(asyncio.run(run_all()), [0] * 20)
+        self.assertLess(time.perf_counter() - start, 5)
@@ -0,0 +1,83 @@
+"""
+Tests for libmugen.parse
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+from io import StringIO
+from unittest import TestCase
+
+from libmugen.parse import MugenParser, iter_config
+
+text = """\
+Kung Fu Man, by Elecbyte
+  credits go here = yes
+
+[Info]
+name = "Kung Fu Man" ; the name
+displayname:Kung Fu Man
+author = Elecbyte # 1999
+; a comment
+# another
+: and another
+this line is bogus
+[ Statedef 200 ]
+type = S ;comment;
+trigger1 = time = 0 :comment
+value = 1;2 ;3 #4
+anim = 200
+  continued
+"""
+
+
+class MugenParserTest(TestCase):
+    def setUp(self):
+        self.config = MugenParser()
+        self.config.read_string(text)
+
+    def test_sections(self):
+        self.assertEqual(self.config.sections(), ['info', 'statedef 200'])
+
+    def test_comments(self):
+        info = self.config['info']
+        self.assertEqual(info['name'], '"Kung Fu Man"')
+        self.assertEqual(info['author'], 'Elecbyte')
+        self.assertEqual(self.config['statedef 200']['type'], 'S')
+        self.assertEqual(self.config['statedef 200']['trigger1'], 'time = 0')
+
+    def test_colon(self):
+        self.assertEqual(self.config['info']['displayname'], 'Kung Fu Man')
+
+    def test_comment_after_text(self):
+        self.assertEqual(self.config['statedef 200']['value'], '1;2')
+
+    def test_bogus_lines(self):
+        self.assertEqual(list(self.config['info']), ['name', 'displayname', 'author'])
+
+    def test_continuation(self):
+        self.assertEqual(self.config['statedef 200']['anim'], '200\ncontinued')
+
+
+class IterConfigTest(TestCase):
+    def test_events(self):
+        events = list(iter_config(text))
+        self.assertEqual(events[0], ('info', None, None, 4))
+        self.assertEqual(events[1], ('info', 'name', '"Kung Fu Man"', 5))
+        self.assertEqual(events[-1], ('statedef 200', 'anim', '200\ncontinued', 16))
+
+    def test_same_as_parser(self):
+        config = MugenParser()
+        config.read_string(text)
+        options = [(section, key, value) for section, key, value, lineno in iter_config(text) if key]
+        expected = [(section, key, value) for section in config.sections()
+                    for key, value in config[section].items()]
+        self.assertEqual(options, expected)
+
+    def test_duplicate_sections(self):
+        events = list(iter_config('[State 200, 1]\ntype = Null\n[State 200, 1]\ntype = Null\n'))
+        self.assertEqual([e[:3] for e in events if e[1]], [('state 200, 1', 'type', 'Null')] * 2)
+
+    def test_file(self):
+        with StringIO(text) as fp:
+            self.assertEqual(list(iter_config(fp)), list(iter_config(text)))
@@ -0,0 +1,54 @@
+"""
+Tests for libmugen.path
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from libmugen.path import DirectoryIndex
+
+
+class DirectoryIndexTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, 'KFM', 'Sprites'))
+        open(os.path.join(self.root, 'KFM', 'Sprites', 'KFM.sff'), 'w').close()
+        self.index = DirectoryIndex()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_resolve(self):
+        expected = os.path.join(self.root, 'KFM', 'Sprites', 'KFM.sff')
+        self.assertEqual(self.index.resolve(self.root, 'kfm\\sprites/kfm.SFF'), expected)
+        self.assertEqual(self.index.resolve(self.root, 'kfm/../KFM/sprites/./kfm.sff'), expected)
+        self.assertIsNone(self.index.resolve(self.root, 'kfm/kfm.sff'))
+        self.assertIsNone(self.index.resolve(self.root, 'missing/kfm.sff'))
+
+    def test_only_files(self):
+        self.assertIsNone(self.index.resolve(self.root, 'kfm/sprites'))
+        self.assertIsNone(self.index.resolve(self.root, 'kfm/sprites/kfm.sff/..'))
+        self.assertIsNone(self.index.resolve(self.root, ''))
+
+    def test_listed_once(self):
+        self.index.resolve(self.root, 'kfm/sprites/kfm.sff')
+        self.index.resolve(self.root, 'kfm/sprites/kfm.air')
+        self.assertEqual(len(self.index), 3)
+
+    def test_async(self):
+        resolved = asyncio.run(self.index.resolve_async(self.root, 'kfm/sprites/kfm.sff'))
+        self.assertEqual(resolved, os.path.join(self.root, 'KFM', 'Sprites', 'KFM.sff'))
+
+    def test_validate(self):
+        folder = os.path.join(self.root, 'KFM')
+        self.assertIsNone(self.index.resolve(folder, 'kfm.def'))
+        open(os.path.join(folder, 'kfm.def'), 'w').close()
+        os.utime(folder, ns=(1, 1))
+        self.index.validate()
+        self.assertEqual(self.index.resolve(folder, 'kfm.def'), os.path.join(folder, 'kfm.def'))
@@ -0,0 +1,150 @@
+"""
+Tests for libmugen.results
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from unittest import TestCase
+
+from libmugen.context import MugenRoot
+from libmugen.results import ResultsStore
+from libmugen.triage import CrashTriage
+
+Match = namedtuple('Match', 'returncode timed_out crashed duration')
+Character = namedtuple('Character', 'path')
+
+
+class ResultsStoreTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.database = os.path.join(self.root, 'results.sqlite')
+        self.kfm = self.write('kfm.def', '[Info]\nname = "kfm"\n')
+        self.sprite = self.write('kfm.sff', 'sff')
+        self.exe = self.write('mugen.exe', 'version 1')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        with open(path, 'w') as fp:
+            fp.write(text)
+        return path
+
+    def test_content_hash(self):
+        with ResultsStore() as store:
+            before = store.content_hash(self.kfm, [self.sprite])
+            self.assertEqual(before, store.content_hash(self.kfm, [self.sprite]))
+            self.assertNotEqual(before, store.content_hash(self.kfm))
+
+            self.write('kfm.sff', 'changed')
+            self.assertNotEqual(before, store.content_hash(self.kfm, [self.sprite]))
+
+    def test_missing_asset(self):
+        with ResultsStore() as store:
+            missing = os.path.join(self.root, 'kfm.snd')
+            before = store.content_hash(self.kfm, [missing])
+            self.write('kfm.snd', 'snd')
+            self.assertNotEqual(before, store.content_hash(self.kfm, [missing]))
+
+    def test_verification_persists(self):
+        with ResultsStore(self.database, self.exe) as store:
+            key = store.record_verification(self.kfm, [self.sprite], 'good')
+
+        with ResultsStore(self.database, self.exe) as store:
+            self.assertEqual(store.verification(key), 'good')
+            self.assertEqual(store.key(self.kfm, [self.sprite]), key)
+
+        self.write('mugen.exe', 'version 2')
+        with ResultsStore(self.database, self.exe) as store:
+            self.assertIsNone(store.verification(key))
+
+    def test_matches(self):
+        with ResultsStore(self.database, self.exe) as store:
+            key = store.key(self.kfm)
+            other = store.key(self.sprite)
+            store.record_match(Match(0, False, False, 1.5), [key])
+            store.record_match(Match(3, False, True, .5), [key])
+            store.record_match(Match(-9, True, False, 15), [key, key])
+            self.assertEqual(store.crash_count(key), (1, 3))
+
+            # a crash of a batch isn't blamed on every character in it
+            store.record_match(Match(3, False, True, .5), [key, other])
+            self.assertEqual(store.crash_count(key), (1, 3))
+            self.assertEqual(store.crash_count(other), (0, 0))
+
+    def test_failure_rates(self):
+        with ResultsStore(self.database, self.exe) as store:
+            store.compatibility[store.key(self.kfm)] = True
+            store.compatibility[store.key(self.sprite)] = True
+            old = store.build
+
+        self.write('mugen.exe', 'version 2')
+        with ResultsStore(self.database, self.exe) as store:
+            store.compatibility[store.key(self.kfm)] = False
+            store.record_verification(self.sprite, (), 'broken')
+            rates = store.failure_rates()
+
+        self.assertEqual([i[2:] for i in rates], [(2, 0), (2, 2)])
+        self.assertEqual(rates[0][0], old)
+        self.assertEqual(rates[1][1], self.exe)
+
+    def test_compatibility_mapping(self):
+        with ResultsStore() as store:
+            key = store.key(self.kfm)
+            self.assertNotIn(key, store.compatibility)
+            store.compatibility[key] = False
+            store.record_verification(self.kfm, (), 'good')
+            self.assertIs(store.compatibility[key], False)
+            self.assertEqual(list(store.compatibility), [key])
+            del store.compatibility[key]
+            self.assertEqual(len(store.compatibility), 0)
+            self.assertEqual(store.verification(key), 'good')
+
+    def test_triage_skips_unchanged(self):
+        characters = [Character(self.write('{}.def'.format(i), str(i))) for i in range(8)]
+
+        async def test(group):
+            return characters[3] not in group
+
+        with ResultsStore(self.database, self.exe) as store:
+            key = lambda character: store.key(character.path)
+            triage = CrashTriage(test, results=store.compatibility, key=key)
+            good, broken = asyncio.run(triage.run(characters))
+            self.assertEqual(broken, [characters[3]])
+
+        self.write('5.def', 'changed')
+        with ResultsStore(self.database, self.exe) as store:
+            key = lambda character: store.key(character.path)
+            triage = CrashTriage(test, results=store.compatibility, key=key)
+            good, broken = asyncio.run(triage.run(characters))
+            self.assertEqual(triage.launches, 1)
+            self.assertEqual(broken, [characters[3]])
+
+
+class VerifyCharacterTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        folder = os.path.join(self.root, 'chars', 'kfm')
+        os.makedirs(folder)
+        with open(os.path.join(folder, 'kfm.def'), 'w') as fp:
+            fp.write('[Info]\nname = "kfm"\n\n[Files]\nsprite = kfm.sff\n')
+        with open(os.path.join(folder, 'kfm.sff'), 'wb') as fp:
+            fp.write(b'sff')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_recorded(self):
+        with ResultsStore() as store:
+            context = MugenRoot(self.root, results=store)
+            asyncio.run(context.scan_root())
+            character, = context.characters
+            key = store.key(character.path, [os.path.join(os.path.dirname(character.path), 'kfm.sff')])
+            self.assertEqual(store.verification(key), 'good')
@@ -0,0 +1,97 @@
+"""
+Tests for libmugen.sandbox
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from libmugen.character import Character
+from libmugen.context import MugenRoot
+from libmugen.path import temp_dir_context
+from libmugen.sandbox import MatchSandbox, stage_file
+from libmugen.stage import Stage
+
+
+class MatchSandboxTest(TestCase):
+    files = {
+        'mugen.exe': '',
+        'mugen.log': 'log',
+        'data/common.snd': '',
+        'data/mugen.cfg': 'cfg',
+        'save/stats.json': 'stats',
+        'chars/kfm/kfm.def': '[Info]\nname = "kfm"\n[Files]\nsprite = kfm.sff\nsound = common.snd\n',
+        'chars/kfm/kfm.sff': '',
+        'chars/kfm/readme.txt': '',
+        'chars/other/other.def': '[Info]\nname = "other"\n',
+        'stages/kfm.def': '[Info]\nname = "kfm"\n[BGdef]\nspr = kfm.sff\n',
+        'stages/kfm.sff': '',
+        'stages/other.def': '[Info]\nname = "other"\n',
+    }
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.parent = tempfile.mkdtemp()
+        for filename, text in self.files.items():
+            path = os.path.join(self.root, filename)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as fp:
+                fp.write(text)
+        self.context = MugenRoot(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        shutil.rmtree(self.parent)
+
+    def test_match(self):
+        player = Character('kfm', None, 'kfm', None, os.path.join(self.root, 'chars', 'kfm', 'kfm.def'))
+        stage = Stage('kfm', 'kfm', os.path.join(self.root, 'stages', 'kfm.def'))
+        with MatchSandbox(self.root, self.parent) as sandbox:
+            match = asyncio.run(sandbox.prepare(self.context, player, player, stage))
+            self.assertEqual(match.root, sandbox.root)
+            self.assertEqual(match.generate_command_args()[:2], ['-p1', os.path.join('chars', 'kfm', 'kfm.def')])
+
+            exists = lambda filename: os.path.exists(os.path.join(sandbox.root, filename))
+            for filename in ('mugen.exe', 'data/common.snd', 'chars/kfm/readme.txt',
+                             'stages/kfm.def', 'stages/kfm.sff'):
+                self.assertTrue(exists(filename), filename)
+            self.assertFalse(exists('chars/other'))
+            self.assertFalse(exists('stages/other.def'))
+
+        self.assertEqual(os.listdir(self.parent), [])
+        self.assertEqual(player.path, os.path.join(self.root, 'chars', 'kfm', 'kfm.def'))
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'chars', 'kfm', 'kfm.sff')))
+
+    def test_writes_isolated(self):
+        with MatchSandbox(self.root, self.parent) as sandbox:
+            for filename in ('mugen.log', 'data/mugen.cfg', 'save/stats.json'):
+                with open(os.path.join(sandbox.root, filename), 'w') as fp:
+                    fp.write('changed')
+            with open(os.path.join(sandbox.root, 'save', 'new.json'), 'w') as fp:
+                fp.write('new')
+
+            # files that are only read are still shared
+            self.assertTrue(os.path.samefile(os.path.join(sandbox.root, 'data', 'common.snd'),
+                                             os.path.join(self.root, 'data', 'common.snd')))
+
+        for filename, text in (('mugen.log', 'log'), ('data/mugen.cfg', 'cfg'),
+                               ('save/stats.json', 'stats')):
+            with open(os.path.join(self.root, filename)) as fp:
+                self.assertEqual(fp.read(), text)
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'save', 'new.json')))
+
+    def test_stage_file(self):
+        src = os.path.join(self.root, 'mugen.exe')
+        dst = os.path.join(self.parent, 'mugen.exe')
+        self.assertIn(stage_file(src, dst), ('link', 'symlink', 'copy'))
+        self.assertRaises(FileExistsError, stage_file, src, dst)
+
+    def test_temp_dir_context(self):
+        with temp_dir_context() as folder:
+            open(os.path.join(folder, 'file'), 'w').close()
+        self.assertFalse(os.path.exists(folder))
@@ -0,0 +1,99 @@
+"""
+Tests for libmugen.scheduler
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import asyncio
+from collections import namedtuple
+from unittest import TestCase
+
+from libmugen.scheduler import MatchScheduler
+
+Result = namedtuple('Result', 'crashed timed_out')
+
+
+class MatchSchedulerTest(TestCase):
+    def run_jobs(self, scheduler, jobs):
+        async def run():
+            async with scheduler:
+                futures = [scheduler.submit(job) for job in jobs]
+            return [f.exception() or f.result() for f in futures]
+        return asyncio.run(run())
+
+    def test_limit(self):
+        scheduler = MatchScheduler(max_workers=4, interval=60)
+        peak = [0]
+
+        async def job():
+            peak[0] = max(peak[0], scheduler.running)
+            await asyncio.sleep(.01)
+            return Result(False, False)
+
+        results = self.run_jobs(scheduler, [job] * 20)
+        self.assertEqual(results, [Result(False, False)] * 20)
+        self.assertEqual(peak[0], 2)
+
+    def test_retry(self):
+        scheduler = MatchScheduler(retries=2, backoff=.01, interval=60)
+        tries = list()
+
+        async def flaky():
+            tries.append(1)
+            if len(tries) < 3:
+                raise OSError
+            return Result(False, False)
+
+        async def broken():
+            raise ValueError
+
+        results = self.run_jobs(scheduler, [flaky, broken])
+        self.assertEqual(results[0], Result(False, False))
+        self.assertIsInstance(results[1], ValueError)
+
+    def test_timeout(self):
+        scheduler = MatchScheduler(retries=1, backoff=0, timeout=.05, interval=60)
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        results = self.run_jobs(scheduler, [hang])
+        self.assertIsInstance(results[0], asyncio.TimeoutError)
+
+    def test_match_results(self):
+        scheduler = MatchScheduler(max_workers=4, retries=2, backoff=0, interval=60)
+        tries = list()
+
+        async def crash():
+            tries.append(1)
+            return Result(True, False)
+
+        async def slow():
+            tries.append(1)
+            return Result(False, True)
+
+        results = self.run_jobs(scheduler, [crash, slow] * 5)
+        self.assertEqual(results, [Result(True, False), Result(False, True)] * 5)
+        self.assertEqual(len(tries), 10)
+
+        # crashes are what is being looked for; they aren't a sign of load
+        self.assertEqual(scheduler.adjust(None, None), scheduler.limit)
+        self.assertEqual(scheduler.limit, 2)
+
+    def test_adjust(self):
+        scheduler = MatchScheduler(max_workers=8)
+        self.assertEqual(scheduler.limit, 4)
+        self.assertEqual(scheduler.adjust(.95, .5), 2)
+        self.assertEqual(scheduler.adjust(.5, .95), 1)
+        self.assertEqual(scheduler.adjust(.95, .95), 1)
+
+        # more only if jobs are waiting for a slot
+        self.assertEqual(scheduler.adjust(.1, .1), 1)
+        scheduler._queue.append(None)
+        scheduler.running = 1
+        self.assertEqual(scheduler.adjust(.1, .1), 2)
+        self.assertEqual(scheduler.adjust(.8, .1), 2)
+
+        scheduler.outcomes.extend([True] * 10)
+        self.assertEqual(scheduler.adjust(.1, .1), 1)
@@ -0,0 +1,138 @@
+"""
+Tests for libmugen.sff
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import os
+import struct
+import tempfile
+from unittest import TestCase, skipIf
+
+from libmugen import sff
+
+
+class RLE8Test(TestCase):
+    # two literals, a run of 3 of color 0x41, one literal
+    data = b'\x01\x80\x43\x41\x02'
+    expected = b'\x01\x80\x41\x41\x41\x02'
+
+    def test_decode(self):
+        pixels = sff.decode_rle8(self.data, len(self.expected))
+        self.assertIsInstance(pixels, bytearray)
+        self.assertEqual(pixels, self.expected)
+
+    def test_decode_truncated(self):
+        pixels = sff.decode_rle8(self.data[:-1], len(self.expected))
+        self.assertEqual(len(pixels), len(self.expected))
+
+    @skipIf(sff.numpy is None, 'numpy is not installed')
+    def test_decode_array(self):
+        pixels = sff.decode_rle8_array(self.data, 3, 2)
+        self.assertEqual(pixels.shape, (2, 3))
+        self.assertEqual(pixels.tobytes(), self.expected)
+
+
+class RLE5Test(TestCase):
+    def test_decode(self):
+        # run of 2 of color 7, then short runs: 2 x color 3, 1 x color 31
+        data = b'\x01\x82\x07\x23\x1f'
+        pixels = sff.decode_rle5(data, 5)
+        self.assertEqual(pixels, b'\x07\x07\x03\x03\x1f')
+
+
+class LZ5Test(TestCase):
+    def test_decode(self):
+        # rle packet of 2 x color 5, then a short copy of 4 at offset 2
+        data = b'\x02\x45\x03\x01'
+        pixels = sff.decode_lz5(data, 6)
+        self.assertEqual(pixels, b'\x05\x05\x05\x05\x05\x05')
+
+    def test_decode_long_rle(self):
+        # long rle packet of 8 + 2 x color 1
+        data = b'\x00\x01\x02'
+        self.assertEqual(sff.decode_lz5(data, 10), b'\x01' * 10)
+
+    def test_copy_before_start(self):
+        self.assertRaises(ValueError, sff.decode_lz5, b'\x01\x01\x00', 4)
+
+
+def build_sff2(path):
+    """ Write a SFF v2 file with one palette, one rle8 sprite and a link
+    """
+    palette = bytes((0, 0, 0, 0, 255, 255, 255, 0))
+    image = struct.pack('<I', 4) + b'\x42\x01\x42\x00'
+    ldata = palette + image
+
+    palettes = sff.sff2_palette_struct.pack(1, 1, 2, 0, 0, len(palette))
+    sprites = (sff.sff2_sprite_struct.pack(9000, 0, 2, 2, 0, 0, 0, 2, 8, len(palette), len(image), 0, 0) +
+               sff.sff2_sprite_struct.pack(9000, 1, 2, 2, 0, 0, 0, 2, 8, 0, 0, 0, 0))
+    palette_offset = 512
+    sprite_offset = palette_offset + len(palettes)
+    ldata_offset = sprite_offset + len(sprites)
+    header = sff.sff2_header_struct.pack(
+        b'ElecbyteSpr\x00', 0, 1, 0, 2, 0, 0, 0, 2,
+        sprite_offset, 2, palette_offset, 1,
+        ldata_offset, len(ldata), ldata_offset + len(ldata), 0)
+
+    with open(path, 'wb') as fp:
+        fp.write(header.ljust(512, b'\x00') + palettes + sprites + ldata)
+
+
+class SFFFileTest(TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sff')
+        os.close(fd)
+        build_sff2(self.path)
+        self.sff_file = sff.SFFFile(self.path)
+
+    def tearDown(self):
+        self.sff_file.close()
+        os.unlink(self.path)
+
+    def test_index(self):
+        self.assertEqual(self.sff_file.version, 2)
+        self.assertEqual(len(self.sff_file), 2)
+        self.assertIn((9000, 0), self.sff_file)
+        self.assertNotIn((9000, 2), self.sff_file)
+
+    def test_pixels(self):
+        self.assertEqual(self.sff_file.pixels(9000, 0), b'\x01\x01\x00\x00')
+
+    def test_linked_sprite(self):
+        self.assertEqual(self.sff_file.pixels(9000, 1), b'\x01\x01\x00\x00')
+
+    def test_palette(self):
+        self.assertEqual(self.sff_file.palette(0), [(0, 0, 0), (255, 255, 255)])
+
+    def test_sprite(self):
+        sprite = self.sff_file.sprite(9000, 0)
+        self.assertEqual((sprite.width, sprite.height), (2, 2))
+        self.assertEqual(sprite.palette, [(0, 0, 0), (255, 255, 255)])
+        self.assertEqual(sprite.pixels, b'\x01\x01\x00\x00')
+
+
+def build_sff1():
+    """ Return a SFF v1 file with two images and a link to the first
+    """
+    images = [(9000, 0, b'first', 0), (9000, 1, b'second', 1), (9000, 2, b'', 0)]
+    header = sff.sff1_header_struct.pack(b'ElecbyteSpr\x00', 0, 1, 0, 1, 1, len(images), 512, 32, 1)
+    data = bytearray(header)
+    for i, (groupno, imageno, image, index) in enumerate(images):
+        next_subfile = len(data) + 32 + len(image) if i < len(images) - 1 else 0
+        data += sff.sff1_subfile_struct.pack(next_subfile, len(image), 0, 0, groupno, imageno, index, 0)
+        data += image
+    return bytes(data)
+
+
+class SFF1IndexTest(TestCase):
+    def test_index(self):
+        data = build_sff1()
+        subfiles = sff.index_sff1(data)
+        self.assertEqual([(i.groupno, i.imageno) for i in subfiles], [(9000, 0), (9000, 1), (9000, 2)])
+        first, second, linked = subfiles
+        self.assertEqual(data[second.offset:second.offset + second.length], b'second')
+        self.assertIsNone(first.linked_index)
+        self.assertEqual(linked.linked_index, 0)
+        self.assertEqual((linked.offset, linked.length), (first.offset, first.length))
@@ -0,0 +1,61 @@
+"""
+Tests for libmugen.triage
+
+
+leif theden, 2012 - 2016
+public domain
+"""
+import asyncio
+import random
+from collections import namedtuple
+from unittest import TestCase
+
+from libmugen.triage import CrashTriage
+
+Character = namedtuple('Character', 'path')
+
+
+class CrashTriageTest(TestCase):
+    def setUp(self):
+        self.characters = [Character('chars/{0}/{0}.def'.format(i)) for i in range(1000)]
+        self.broken = set(random.Random(1).sample(self.characters, 10))
+
+    def triage(self, **kwargs):
+        async def test(group):
+            await asyncio.sleep(0)
+            return not self.broken.intersection(group)
+
+        return CrashTriage(test, key=lambda character: character.path, **kwargs)
+
+    def test_finds_broken(self):
+        # four a side, as in MUGEN 1.x
+        triage = self.triage(batch_size=8)
+        good, broken = asyncio.run(triage.run(self.characters))
+        self.assertEqual(set(broken), self.broken)
+        self.assertEqual(len(good), 990)
+        self.assertLess(triage.launches, 200)
+
+    def test_one_a_side(self):
+        # no worse than testing every character in a pair
+        triage = self.triage(batch_size=2)
+        good, broken = asyncio.run(triage.run(self.characters))
+        self.assertEqual(set(broken), self.broken)
+        self.assertLess(triage.launches, 550)
+
+    def test_results_reused(self):
+        results = dict()
+        asyncio.run(self.triage(batch_size=8, results=results).run(self.characters[:500]))
+
+        # only the other half is tested
+        triage = self.triage(batch_size=8, results=results)
+        good, broken = asyncio.run(triage.run(self.characters))
+        self.assertEqual(set(broken), self.broken)
+        self.assertLess(triage.launches, 100)
+        self.assertGreater(triage.launches, 0)
+
+    def test_all_cached(self):
+        results = {i.path: i not in self.broken for i in self.characters}
+        triage = self.triage(results=results)
+        good, broken = asyncio.run(triage.run(self.characters))
+        self.assertEqual(triage.launches, 0)
+        self.assertEqual(set(broken), self.broken)